@@ -0,0 +1,104 @@
+"""
+csv_columns
+~~~~~~~~~~~
+Read the csv files of this chapter into typed numpy columns.  A csv file
+is parsed only once: its columns are stored as .npy files in a cache
+directory, together with the header and the modification time and the
+size of the csv file.  As long as the csv file is unchanged, later calls
+memory-map the columns from the cache, so they do not pay the cost of
+parsing the text again.
+"""
+
+import csv
+import json
+import os
+import sys
+import numpy as np
+
+# The module directory_cache is shared with mnist_loader in the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from directory_cache import replace_directory
+
+CACHE_VERSION = 1
+
+def load_columns(fileName, cache=None, mmap=True, skipinitialspace=False):
+    """
+    * fileName:         name of a csv file with a header line
+    * cache:            directory of the cache, by default fileName + '.cache'
+    * mmap:             if True, the columns are memory-mapped read-only
+    * skipinitialspace: if True, blanks after a comma are ignored
+    returns the pair (Header, Columns) where Header maps the name of every
+    column to its index and Columns is the list of the columns.  A column
+    has type numpy.int64 if all of its entries are integers, numpy.float64
+    if they are numbers, and is an array of strings otherwise.
+    """
+    if cache is None:
+        cache = fileName + '.cache'
+    stat = os.stat(fileName)
+    key  = { 'version': CACHE_VERSION, 'mtime_ns': stat.st_mtime_ns,
+             'size': stat.st_size, 'skipinitialspace': skipinitialspace }
+    meta = _read_meta(cache)
+    if meta is None or meta['key'] != key:
+        _build_cache(fileName, cache, key)
+        meta = _read_meta(cache)
+    mode    = 'r' if mmap else None
+    Names   = meta['header']
+    Columns = [np.load(os.path.join(cache, f'{k}.npy'), mmap_mode=mode) for k in range(len(Names))]
+    return { name: k for k, name in enumerate(Names) }, Columns
+
+def as_matrix(Columns, indices, ones=False):
+    """
+    * Columns: list of numeric columns
+    * indices: list of the indices of the columns to use
+    * ones:    if True, a column of ones is appended
+    returns a matrix of type numpy.float64 with one row per line of the csv file
+    """
+    m = len(Columns[0]) if Columns else 0
+    X = np.empty((m, len(indices) + ones))
+    for j, i in enumerate(indices):
+        X[:, j] = Columns[i]
+    if ones:
+        X[:, -1] = 1.0
+    return X
+
+def parse(fileName, skipinitialspace=False):
+    """
+    Parse the csv file fileName and return the pair (Names, Columns) of the
+    list of the column names and the list of the typed columns.
+    """
+    with open(fileName) as input_file:
+        reader = csv.reader(input_file, delimiter=',', skipinitialspace=skipinitialspace)
+        Names  = next(reader)
+        Rows   = [row for row in reader if row]
+    Columns = list(zip(*Rows)) if Rows else [() for _ in Names]
+    return Names, [_typed(column) for column in Columns]
+
+def _typed(column):
+    "Convert the strings in column into an array of the narrowest fitting type."
+    for dtype in (np.int64, np.float64):
+        try:
+            return np.array(column, dtype=dtype)
+        except ValueError:
+            pass
+    return np.array(column, dtype=str)
+
+def _read_meta(cache):
+    "Return the contents of the file meta.json of the cache, or None."
+    try:
+        with open(os.path.join(cache, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _build_cache(fileName, cache, key):
+    """
+    Parse fileName and store its columns as .npy files in the directory
+    cache.  meta.json is written last.
+    """
+    Names, Columns = parse(fileName, key['skipinitialspace'])
+    def write(tmp):
+        for k, column in enumerate(Columns):
+            np.save(os.path.join(tmp, f'{k}.npy'), column)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({ 'key': key, 'header': Names }, f)
+    replace_directory(cache, write)
@@ -0,0 +1,238 @@
+"""
+least_squares
+~~~~~~~~~~~~~
+Linear regression that keeps the triangular factor R of the QR
+decomposition of the augmented data matrix Z = [1, X, y], i.e. of the
+matrix X with a column of ones prepended and the vector y appended.  As
+ZᵀZ = RᵀR, R is also the Cholesky factor of ZᵀZ, but it is computed from Z
+itself, so the condition number of X is not squared.  Everything needed
+for the regression can be read off R:
+
+  * the weights w solve the triangular system R[:p, :p] w = R[:p, p],
+  * the residual sum of squares of the regression on the first k columns
+    of Z is the sum of the squares of R[k:, p], in particular
+    RSS = R[p, p]² and TSS = Σ R[1:, p]²,
+
+where p = d + 1 is the number of columns of [1, X].  When a row is added
+or removed, R is updated with Givens or hyperbolic rotations in O(p²)
+operations.  Subsets of the explaining columns are evaluated with the
+sweep operator on RᵀR, so no subset has to be factorised on its own.
+"""
+
+import numpy as np
+
+class LeastSquares(object):
+    def __init__(self, X, y):
+        """
+        * X: explaining variables, numpy array of shape (n, d)
+        * y: dependant variable, numpy array of shape (n,)
+        """
+        Z       = self._augment(X, y)
+        self.mD = Z.shape[1] - 2
+        self.mR = np.zeros((self.mD + 2, self.mD + 2))
+        self.mN = 0
+        self._add_rows(Z)
+
+    @staticmethod
+    def _augment(X, y):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        if len(X) != len(y):
+            raise ValueError(f'{len(X)} rows of X, but {len(y)} values of y')
+        return np.column_stack([np.ones(len(y)), X, y])
+
+    def add_rows(self, X, y):
+        "Add the rows X with the values y by a QR decomposition of [R; Z]."
+        self._add_rows(self._augment(X, y))
+
+    def _add_rows(self, Z):
+        R = np.linalg.qr(np.vstack([self.mR, Z]), mode='r')
+        self.mR[:len(R)] = R * np.where(np.diag(R) < 0, -1.0, 1.0)[:, np.newaxis]
+        self.mN += len(Z)
+
+    def add(self, x, y):
+        "Add the row x with the value y.  This needs O(p²) operations."
+        v = self._augment(x, y)[0]
+        R = self.mR
+        for k in range(len(v)):
+            r = np.hypot(R[k, k], v[k])
+            if r == 0.0:
+                continue
+            c, s    = R[k, k] / r, v[k] / r
+            R[k, k] = r
+            Rk      = R[k, k+1:].copy()
+            R[k, k+1:] = c * Rk + s * v[k+1:]
+            v[k+1:]    = c * v[k+1:] - s * Rk
+        self.mN += 1
+
+    def remove(self, x, y, tol=1e-10):
+        """
+        Remove the row x with the value y, which must have been added
+        before.  This needs O(p²) operations.  Raise a ValueError if the
+        remaining rows do not determine the regression any more, i.e. if
+        fewer than p rows would remain or if a diagonal entry of R would
+        vanish up to the relative tolerance tol.  The downdate is computed
+        on a copy of R, so after a ValueError the object is unchanged.
+        """
+        p = self.mD + 1
+        if self.mN - 1 < p:
+            raise ValueError(f'{self.mN - 1} rows can not determine {p} parameters')
+        v = self._augment(x, y)[0]
+        R = self.mR.copy()
+        for k in range(len(v)):
+            d = (R[k, k] - v[k]) * (R[k, k] + v[k])
+            if d <= tol * R[k, k] ** 2:
+                if k == p:
+                    R[k, k] = 0.0   # the remaining rows are fitted exactly
+                    break
+                raise ValueError('removing this row makes the regression singular')
+            r = np.sqrt(d)
+            c, s    = r / R[k, k], v[k] / R[k, k]
+            R[k, k] = r
+            R[k, k+1:] = (R[k, k+1:] - s * v[k+1:]) / c
+            v[k+1:]    = c * v[k+1:] - s * R[k, k+1:]
+        self.mR  = R
+        self.mN -= 1
+
+    def weights(self):
+        """
+        Return the vector w of length d + 1 where w[0] is the intercept and
+        w[1:] are the coefficients of the columns of X.
+        """
+        p = self.mD + 1
+        return np.linalg.solve(self.mR[:p, :p], self.mR[:p, p])
+
+    def rss(self):
+        return self.mR[-1, -1] ** 2
+
+    def tss(self):
+        return np.sum(self.mR[1:, -1] ** 2)
+
+    def r2(self):
+        "Return the coefficient of determination."
+        return 1 - self.rss() / self.tss()
+
+    def cross_products(self):
+        """
+        Return ZᵀZ computed from R with the intercept swept, so that the
+        result describes the regression of y on the intercept alone.  The
+        row and column of the intercept are dropped.
+        """
+        A = self.mR.T @ self.mR
+        sweep(A, 0)
+        return A[1:, 1:]
+
+    def subset_rss(self, Columns):
+        """
+        Return the residual sum of squares of the regression of y on the
+        intercept and the columns of X whose indices are in Columns.
+        """
+        A = self.cross_products()
+        for j in Columns:
+            sweep(A, j)
+        return A[-1, -1]
+
+    def forward_stepwise(self, max_size=None):
+        """
+        Starting with no columns, repeatedly add the column of X that reduces
+        the RSS most.  Return the list of the pairs (Columns, R2) after every
+        step.  Columns that are linear combinations of the chosen columns
+        are never added.  A candidate j is evaluated in O(1), since sweeping
+        it would reduce the RSS by A[j, y]² / A[j, j].  Only the chosen
+        column is swept, which needs O(d²) operations.
+        """
+        A, tss   = self.cross_products(), self.tss()
+        d        = self.mD
+        max_size = d if max_size is None else max_size
+        Diagonal = np.diag(A).copy()
+        Chosen   = []
+        Path     = []
+        while len(Chosen) < max_size:
+            Candidates = [j for j in range(d)
+                            if j not in Chosen and A[j, j] > _TOLERANCE * Diagonal[j]]
+            if not Candidates:
+                break
+            j = max(Candidates, key=lambda j: A[j, -1] ** 2 / A[j, j])
+            sweep(A, j)
+            Chosen.append(j)
+            Path.append((list(Chosen), 1 - A[-1, -1] / tss))
+        return Path
+
+    def backward_stepwise(self, min_size=0):
+        """
+        Starting with all columns, repeatedly remove the column of X whose
+        removal increases the RSS least.  Return the list of the pairs
+        (Columns, R2) after every step, beginning with all columns.  For a
+        swept column j, A[j, j] < 0 and unsweeping it would increase the RSS
+        by -A[j, y]² / A[j, j].
+        """
+        A, tss = self.cross_products(), self.tss()
+        Chosen = list(range(self.mD))
+        for j in Chosen:
+            sweep(A, j)
+        Path = [(list(Chosen), 1 - A[-1, -1] / tss)]
+        while len(Chosen) > min_size:
+            j = min(Chosen, key=lambda j: -A[j, -1] ** 2 / A[j, j])
+            sweep(A, j, inverse=True)
+            Chosen.remove(j)
+            Path.append((list(Chosen), 1 - A[-1, -1] / tss))
+        return Path
+
+    def best_subset(self, max_size=None):
+        """
+        Return a dictionary that maps every size k up to max_size to the pair
+        (Columns, R2) of the best subset of k columns of X.  All 2^d subsets
+        are visited in the order of a Gray code, where consecutive subsets
+        differ in one column, so every subset costs a single sweep of O(d²)
+        operations.  This is only feasible for d up to about 20, and X must
+        have full column rank.
+        """
+        A, tss   = self.cross_products(), self.tss()
+        d        = self.mD
+        max_size = d if max_size is None else max_size
+        Swept    = [False] * d
+        Best     = { 0: ([], 1 - A[-1, -1] / tss) }
+        for i in range(1, 2 ** d):
+            j = (i & -i).bit_length() - 1   # the bit that changes in the Gray code
+            sweep(A, j, inverse=Swept[j])
+            Swept[j] = not Swept[j]
+            k = sum(Swept)
+            if k <= max_size:
+                R2 = 1 - A[-1, -1] / tss
+                if k not in Best or R2 > Best[k][1]:
+                    Best[k] = ([c for c in range(d) if Swept[c]], R2)
+        return Best
+
+# A column whose pivot has shrunk below _TOLERANCE times its initial value
+# is a linear combination of the columns swept so far.
+_TOLERANCE = 1e-12
+
+def sweep(A, k, inverse=False):
+    """
+    Sweep the symmetric matrix A on the pivot k in place.  Sweeping on k
+    again with inverse=True undoes the sweep.  If A is the cross-product
+    matrix of [X, y] and a set S of columns has been swept, then A[y, y] is
+    the residual sum of squares of the regression of y on the columns in S,
+    A[S, y] are its weights and -A[S, S] is the inverse of X[:, S]ᵀX[:, S].
+    Raise a ValueError if the pivot is zero.
+    """
+    d = A[k, k]
+    if d == 0.0:
+        raise ValueError(f'cannot sweep on column {k}, its pivot is zero')
+    a = A[k].copy()
+    A -= np.outer(a, a) / d
+    A[k]    = (-a if inverse else a) / d
+    A[:, k] = A[k]
+    A[k, k] = -1.0 / d
+
+if __name__ == '__main__':
+    import csv_columns
+    Header, Columns = csv_columns.load_columns('cars.csv')
+    explaining = [1, 2, 3, 4, 5, 6]
+    colNames   = { k: name for name, k in Header.items() }
+    X = csv_columns.as_matrix(Columns, explaining)
+    y = 1 / Columns[0]
+    L = LeastSquares(X, y)
+    print(f'portion of explained variance : {L.r2()}')
+    for Chosen, R2 in L.forward_stepwise():
+        print(f'{[colNames[explaining[j]] for j in Chosen]}: {R2}')
@@ -1,27 +1,19 @@
-import csv
 import numpy as np
+import csv_columns
+from streaming_regression import linear_regression_streaming
 
 def linear_regression(fileName, target, explaining, f):
     """
     * fileName:   name of a csv file
     * target:     column of the dependent variable
     * explaining: list of columns containing the explaining variables
-    * f:          function to process the target
+    * f:          function to process the target, applied to every value
     returns the coefficient of determination R2
     """
-    with open(fileName) as input_file:
-        reader     = csv.reader(input_file, delimiter=',')
-        line_count = 0
-        goal       = []
-        Causes     = []
-        for row in reader:
-            if line_count != 0:  
-                goal  .append(f(float(row[target])))  
-                Causes.append([float(row[i]) for i in explaining] + [1.0]) 
-            line_count += 1
-    m = len(goal)
-    X = np.array(Causes)
-    y = np.array(goal)
+    Header, Columns = csv_columns.load_columns(fileName)
+    X = csv_columns.as_matrix(Columns, explaining, ones=True)
+    y = np.array([f(float(t)) for t in Columns[target]])
+    m = len(y)
     w = np.linalg.solve(X.T @ X, X.T @ y)
     RSS   = np.sum((X @ w - y) ** 2)
     yMean = np.sum(y) / m
@@ -33,5 +25,8 @@ def main():
     explaining = [1, 2, 3, 4, 5, 6]
     R2 = linear_regression("cars.csv", 0, explaining, lambda x: 1/x)
     print(f'portion of explained variance : {R2}')
+    R2 = linear_regression_streaming("cars.csv", 0, explaining, np.reciprocal, chunk_size=100)
+    print(f'portion of explained variance (streaming): {R2}')
 
-main()
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import numpy as np
-import csv
+import csv_columns
 import gradient_ascent
 
 def sigmoid(t):
@@ -31,18 +31,9 @@ def gradLL(X, y, w):
     return np.array(Gradient)
 
 def logisticRegressionFile(name):
-    with open(name) as file:
-        reader = csv.reader(file, delimiter=',', skipinitialspace=True)
-        count  = 0  # line count
-        Pass   = []
-        Hours  = []
-        for row in reader:
-            if count != 0:  # skip header
-                Pass .append(float(row[0]))
-                Hours.append(float(row[1]))
-            count += 1
-    y = np.array(Pass)
-    x = np.array(Hours)
+    Header, Columns = csv_columns.load_columns(name, skipinitialspace=True)
+    y = np.asarray(Columns[0], dtype=float)
+    x = np.asarray(Columns[1], dtype=float)
     n = len(y)
     X = np.reshape(x, (n,1))
     X = np.append(np.ones((n, 1)), X, axis=-1)
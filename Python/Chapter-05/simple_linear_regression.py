@@ -1,5 +1,5 @@
-import csv
 import numpy as np
+import csv_columns
 
 def simple_linear_regression(X, Y):
     """
@@ -20,33 +20,100 @@ def simple_linear_regression(X, Y):
     R2    = 1 - RSS / TSS;
     return R2
 
+def screening_statistics(X, Y):
+    """
+    * X: explaining variables, numpy array of shape (n, d)
+    * Y: dependant variable, numpy array of shape (n,)
+
+    Output: The tuple (n, xMean, yMean, Sxx, Sxy, Syy) where xMean, Sxx and
+            Sxy are vectors with one entry per column of X and
+            Sxx = Σ (x - xMean)², Sxy = Σ (x - xMean) * (y - yMean) and
+            Syy = Σ (y - yMean)².
+    """
+    n     = len(Y)
+    xMean = np.mean(X, axis=0)
+    yMean = np.mean(Y)
+    DX    = X - xMean
+    DY    = Y - yMean
+    return n, xMean, yMean, np.einsum('ij,ij->j', DX, DX), DY @ DX, DY @ DY
+
+def merge_screening(S, T):
+    """
+    Merge the screening statistics S and T of two disjoint sets of rows.
+    The centred sums are combined with the formulas of Chan et al., so no
+    large uncentred sums are ever formed.
+    """
+    n1, xMean1, yMean1, Sxx1, Sxy1, Syy1 = S
+    n2, xMean2, yMean2, Sxx2, Sxy2, Syy2 = T
+    n = n1 + n2
+    if n1 == 0 or n2 == 0:
+        return S if n2 == 0 else T
+    dx = xMean2 - xMean1
+    dy = yMean2 - yMean1
+    f  = n1 * n2 / n
+    return (n, xMean1 + dx * n2 / n, yMean1 + dy * n2 / n,
+            Sxx1 + Sxx2 + f * dx * dx, Sxy1 + Sxy2 + f * dx * dy, Syy1 + Syy2 + f * dy * dy)
+
+def screen(X, Y):
+    """
+    Compute the simple linear regressions of Y on every column of X at once.
+
+    * X: explaining variables, numpy array of shape (n, d)
+    * Y: dependant variable, numpy array of shape (n,)
+
+    Output: The tuple (Order, R2, ϑ0, ϑ1) of numpy arrays, where Order
+            contains the indices of the columns of X sorted by decreasing
+            R2 value, and R2, ϑ0 and ϑ1 contain the R2 values, the
+            intercepts and the slopes in this order.
+    """
+    return screen_statistics(screening_statistics(X, Y))
+
+def screen_chunks(Chunks):
+    """
+    Like screen, but for an iterable Chunks of pairs (X, Y) containing
+    consecutive rows of the data, so that n may be too large for memory.
+    Raises a ValueError if Chunks is empty.
+    """
+    S = None
+    for X, Y in Chunks:
+        T = screening_statistics(X, Y)
+        S = T if S is None else merge_screening(S, T)
+    if S is None:
+        raise ValueError('screen_chunks needs at least one chunk of rows')
+    return screen_statistics(S)
+
+def screen_statistics(S):
+    """
+    Compute the result of screen from the screening statistics S.  As
+    RSS = Syy - Sxy² / Sxx, R2 = Sxy² / (Sxx * Syy).  Constant columns get
+    the R2 value 0, and if Y is constant, all columns get the R2 value 0.
+    """
+    n, xMean, yMean, Sxx, Sxy, Syy = S
+    ϑ1    = np.divide(Sxy, Sxx, out=np.zeros_like(Sxy), where=Sxx > 0)
+    ϑ0    = yMean - ϑ1 * xMean
+    R2    = np.divide(ϑ1 * Sxy, Syy, out=np.zeros_like(Sxy), where=Syy > 0)
+    Order = np.argsort(-R2, kind='stable')
+    return Order, R2[Order], ϑ0[Order], ϑ1[Order]
+
 def test(col):
     """
     Compute the coefficient of determination for the specified column
     of the csv file 'cars.csv'.
     """
-    with open('cars.csv') as input_file:
-        reader     = csv.reader(input_file, delimiter=',')
-        line_count = 0
-        mpg        = []
-        cause      = []
-        colNames   = {}
-        for row in reader:
-            if line_count == 0:  
-                colNames = { col:row[col] for col in range(len(row)) }
-            else:
-                mpg  .append(float(row[0]))  
-                cause.append(float(row[col])) 
-            line_count += 1
-    m  = len(mpg)
-    X  = np.array(cause)
-    Y  = np.array([1 / mpg[i] for i in range(m)])
+    Header, Columns = csv_columns.load_columns('cars.csv')
+    colNames = { k: name for name, k in Header.items() }
+    X  = Columns[col]
+    Y  = 1 / Columns[0]
     R2 = simple_linear_regression(X, Y)
     return colNames[col], R2
      
 if __name__ == '__main__':
-    for col in range(1, 6+1):
-        name, R2 = test(col)
-        padded   = '%15s' % ('"' + name + '"')
+    Header, Columns = csv_columns.load_columns('cars.csv')
+    colNames = { k: name for name, k in Header.items() }
+    X = csv_columns.as_matrix(Columns, range(1, 6+1))
+    Y = 1 / Columns[0]
+    Order, R2s, _, _ = screen(X, Y)
+    for col, R2 in zip(Order + 1, R2s):
+        padded   = '%15s' % ('"' + colNames[col] + '"')
         R2       = str(round(1000 * R2)/10) + '%'
         print('The explained variance of the variable %s is %s.' % (padded, R2))
@@ -0,0 +1,150 @@
+"""
+streaming_regression
+~~~~~~~~~~~~~~~~~~~~
+Linear regression over a csv file that is read in chunks.  Only the
+centred sufficient statistics of the chunks are accumulated, so the memory
+needed does not depend on the number of rows.  The file can be split into
+byte ranges that are read by several worker processes.  This code lives in
+its own module, so that worker processes can import it by name.
+"""
+
+import csv
+import multiprocessing
+import os
+import numpy as np
+
+def sufficient_statistics(X, y):
+    """
+    * X: matrix of the explaining variables of some rows, one row per observation
+    * y: vector of the processed targets of these rows
+    returns the tuple (m, xMean, yMean, Sxx, Sxy, Syy) of the centred
+    statistics of these rows, where Sxx = Σ (x - xMean)(x - xMean)ᵀ,
+    Sxy = Σ (x - xMean) * (y - yMean) and Syy = Σ (y - yMean)².  As the
+    sums are centred, a large mean of y or of a column of X does not cancel
+    the significant digits of the result.
+    """
+    m = len(y)
+    d = X.shape[1]
+    if m == 0:
+        return 0, np.zeros(d), 0.0, np.zeros((d, d)), np.zeros(d), 0.0
+    xMean = np.mean(X, axis=0)
+    yMean = np.mean(y)
+    DX    = X - xMean
+    DY    = y - yMean
+    return m, xMean, yMean, DX.T @ DX, DY @ DX, DY @ DY
+
+def merge(S, T):
+    """
+    Merge the statistics S and T of two disjoint sets of rows with the
+    pairwise update of Chan et al., like merge_screening in the module
+    simple_linear_regression.
+    """
+    m1, xMean1, yMean1, Sxx1, Sxy1, Syy1 = S
+    m2, xMean2, yMean2, Sxx2, Sxy2, Syy2 = T
+    if m1 == 0 or m2 == 0:
+        return S if m2 == 0 else T
+    m  = m1 + m2
+    dx = xMean2 - xMean1
+    dy = yMean2 - yMean1
+    f  = m1 * m2 / m
+    return (m, xMean1 + dx * m2 / m, yMean1 + dy * m2 / m,
+            Sxx1 + Sxx2 + f * np.outer(dx, dx), Sxy1 + Sxy2 + f * dx * dy, Syy1 + Syy2 + f * dy * dy)
+
+def solve_statistics(S):
+    """
+    * S: statistics (m, xMean, yMean, Sxx, Sxy, Syy) of all rows
+    returns the pair (w, R2) of the weights and the coefficient of
+    determination, where the intercept is the last entry of w.  The slopes
+    v solve Sxx v = Sxy, then RSS = Syy - vᵀSxy and TSS = Syy.
+    """
+    m, xMean, yMean, Sxx, Sxy, Syy = S
+    v = np.linalg.solve(Sxx, Sxy)
+    w = np.append(v, yMean - v @ xMean)
+    return w, (v @ Sxy) / Syy
+
+def byte_ranges(fileName, parts):
+    """
+    Split the file fileName into parts ranges [start, end) of roughly equal
+    size.  A line belongs to the range in which it starts.
+    """
+    size  = os.path.getsize(fileName)
+    Cuts  = [size * k // parts for k in range(parts + 1)]
+    return list(zip(Cuts[:-1], Cuts[1:]))
+
+def read_chunks(fileName, target, explaining, start=0, end=None, chunk_size=100000):
+    """
+    Generate the rows of the csv file fileName that start in the byte range
+    [start, end) as pairs (X, t) of numpy arrays with at most chunk_size rows,
+    where X holds the columns explaining and t the column target.  The header
+    is skipped.  Fields must not contain line breaks.
+    """
+    Columns = list(explaining) + [target]
+    with open(fileName, 'rb') as input_file:
+        if start == 0:
+            input_file.readline()
+        else:
+            input_file.seek(start - 1)
+            input_file.readline()   # skip the rest of the line that starts before start
+        position = input_file.tell()
+        Lines    = []
+        while end is None or position < end:
+            line = input_file.readline()
+            if not line:
+                break
+            position += len(line)
+            Lines.append(line.decode())
+            if len(Lines) == chunk_size:
+                yield _parse(Lines, Columns)
+                Lines = []
+        if Lines:
+            yield _parse(Lines, Columns)
+
+def _parse(Lines, Columns):
+    Rows = [[row[i] for i in Columns] for row in csv.reader(Lines, delimiter=',') if row]
+    Data = np.array(Rows, dtype=float).reshape(-1, len(Columns))
+    return Data[:, :-1], Data[:, -1]
+
+# The function processing the target in a worker process, set by _init_worker.
+Transform = None
+
+def _init_worker(f):
+    global Transform
+    Transform = f
+
+def _range_statistics(args):
+    fileName, target, explaining, start, end, chunk_size = args
+    S = sufficient_statistics(np.empty((0, len(explaining))), np.empty(0))
+    for X, t in read_chunks(fileName, target, explaining, start, end, chunk_size):
+        S = merge(S, sufficient_statistics(X, Transform(t)))
+    return S
+
+def linear_regression_streaming(fileName, target, explaining, f, chunk_size=100000, workers=1):
+    """
+    * fileName:   name of a csv file
+    * target:     column of the dependent variable
+    * explaining: list of columns containing the explaining variables
+    * f:          function to process the target, applied to numpy arrays
+    * chunk_size: number of rows that are parsed at once
+    * workers:    number of processes reading disjoint byte ranges of the file
+    returns the coefficient of determination R2
+
+    Only the centred statistics of the chunks are accumulated, so the
+    memory needed does not depend on the number of rows.  If workers > 1,
+    f is passed to the workers when they are started, so it has to be
+    picklable, e.g. a numpy ufunc or a function defined at module level, but
+    not a lambda: under the spawn start method, which is the default on
+    macOS and Windows, a lambda cannot be sent to the workers.
+    """
+    Ranges = byte_ranges(fileName, workers)
+    Tasks  = [(fileName, target, explaining, start, end, chunk_size) for start, end in Ranges]
+    if workers == 1:
+        _init_worker(f)
+        Stats = [_range_statistics(task) for task in Tasks]
+    else:
+        with multiprocessing.Pool(workers, _init_worker, (f,)) as pool:
+            Stats = pool.map(_range_statistics, Tasks)
+    S = Stats[0]
+    for T in Stats[1:]:
+        S = merge(S, T)
+    w, R2 = solve_statistics(S)
+    return R2
@@ -0,0 +1,96 @@
+"""
+activations
+~~~~~~~~~~~
+Activation functions for the layers of network.Network.  Every activation
+is a class with two static methods that work in place on matrices with one
+column per input:
+
+  * forward(Z, T)     overwrites Z with the activation of Z,
+  * backward(E, A, T) multiplies E elementwise by the derivative of the
+                      activation function, computed from the activation A.
+
+T is a scratch matrix with the same number of columns as Z.  forward only
+uses the first row of T.  As the derivatives are computed from the
+activations, a layer only has to keep its activations and not the inputs Z
+of the activation function.  gain is the factor by which the initial
+weights of a layer with this activation are scaled.  ACTIVATIONS maps the
+names of the activations to the classes.
+"""
+
+import numpy as np
+
+def sigmoid(x, out=None):
+    """
+    Compute the sigmoid function.  If out is given, the result is written
+    into out, which may be x itself, and no new array is allocated.
+    """
+    out = np.negative(x, out=out)
+    np.exp(out, out=out)
+    out += 1.0
+    return np.reciprocal(out, out=out)
+
+class Sigmoid(object):
+    gain = 1.0
+
+    @staticmethod
+    def forward(Z, T):
+        sigmoid(Z, out=Z)
+
+    @staticmethod
+    def backward(E, A, T):
+        "sigmoid'(z) = A * (1 - A)"
+        np.subtract(1.0, A, out=T)
+        T *= A
+        E *= T
+
+class Tanh(object):
+    gain = 1.0
+
+    @staticmethod
+    def forward(Z, T):
+        np.tanh(Z, out=Z)
+
+    @staticmethod
+    def backward(E, A, T):
+        "tanh'(z) = 1 - A * A"
+        np.multiply(A, A, out=T)
+        np.subtract(1.0, T, out=T)
+        E *= T
+
+class ReLU(object):
+    gain = np.sqrt(2.0)
+
+    @staticmethod
+    def forward(Z, T):
+        np.maximum(Z, 0.0, out=Z)
+
+    @staticmethod
+    def backward(E, A, T):
+        "relu'(z) = 1 if A > 0 else 0, and as A >= 0, this is sign(A)."
+        np.sign(A, out=T)
+        E *= T
+
+class Softmax(object):
+    """
+    The softmax function, which turns every column into a probability
+    distribution.  The maximum of a column is subtracted before the
+    exponential is taken, so that the exponential can not overflow.
+    Softmax can only be used in the output layer together with the
+    cross-entropy cost, where the derivative is not needed.
+    """
+    gain = 1.0
+
+    @staticmethod
+    def forward(Z, T):
+        S = T[:1]
+        np.max(Z, axis=0, keepdims=True, out=S)
+        Z -= S
+        np.exp(Z, out=Z)
+        np.sum(Z, axis=0, keepdims=True, out=S)
+        Z /= S
+
+    @staticmethod
+    def backward(E, A, T):
+        raise ValueError('softmax can only be used in the output layer')
+
+ACTIVATIONS = { 'sigmoid': Sigmoid, 'tanh': Tanh, 'relu': ReLU, 'softmax': Softmax }
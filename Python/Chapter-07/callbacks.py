@@ -0,0 +1,144 @@
+"""
+callbacks
+~~~~~~~~~
+Callbacks for the training methods of network.Network.  A callback is an
+object with the methods on_batch_end and on_epoch_end, both of which are
+called with the network and a record.  A batch record is a dictionary with
+the keys
+
+  * epoch:     the number of the epoch,
+  * batch:     the number of the mini-batch in this epoch,
+  * size:      the number of inputs of the mini-batch,
+  * grad_norm: the norm of the average gradient of the mini-batch, or None
+               if no callback has set the attribute needs_grad_norm,
+  * seconds:   the time needed to process the mini-batch.
+
+An epoch record is a dictionary with the keys
+
+  * epoch:           the number of the epoch,
+  * samples:         the number of training inputs,
+  * seconds:         the wall time of the epoch, including evaluation,
+  * samples_per_sec: the number of training inputs processed per second,
+  * phases:          a dictionary mapping the phases in PHASES to seconds,
+  * correct:         the number of correct test results or None if the
+                     network has not been evaluated in this epoch,
+  * test_size:       the number of test inputs, 0 if there is no test data.
+
+Computing the norm of the gradient costs time for every mini-batch, so it
+is only computed if at least one callback has the attribute needs_grad_norm
+set to True.  The time needed is booked as the phase grad_norm.
+
+If on_epoch_end returns True, training stops after this epoch.  Callbacks
+may add keys to the epoch record, e.g. EarlyStopping adds the key
+validation, so callbacks that come later in the list see these keys.  At
+the end of training, on_train_end is called with the network.
+"""
+
+import json
+import time
+
+import numpy as np
+
+PHASES = ['shuffle', 'batching', 'forward', 'backward', 'grad_norm', 'update', 'evaluation']
+
+class Callback(object):
+    "Base class of all callbacks.  Its methods do nothing."
+    needs_grad_norm = False
+
+    def on_batch_end(self, net, record):
+        pass
+
+    def on_epoch_end(self, net, record):
+        pass
+
+    def on_train_end(self, net):
+        pass
+
+class PrintProgress(Callback):
+    """
+    Print the number of correct test results after every epoch, or only the
+    number of the epoch if the network has not been evaluated.
+    """
+    def on_epoch_end(self, net, record):
+        if record['correct'] is None:
+            print(f"Epoch {record['epoch']} complete")
+        else:
+            print(f"Epoch {record['epoch']}: {record['correct']} / {record['test_size']}")
+        if 'validation' in record:
+            print(f"  validation: {record['validation']} / {record['validation_size']}")
+
+class MetricsLog(Callback):
+    def __init__(self, path=None, batches=False):
+        """
+        Collect the epoch records in the list mEpochs and, if batches is
+        True, the batch records in the list mBatches.  If path is given,
+        every record is also appended as one line of JSON to the file path,
+        where the key 'kind' tells whether it is a batch or an epoch record.
+        If batches is True, the batch records contain the norm of the
+        gradient.
+        """
+        self.needs_grad_norm = batches
+        self.mPath    = path
+        self.mBatches = [] if batches else None
+        self.mEpochs  = []
+
+    def _write(self, kind, record):
+        if self.mPath is not None:
+            with open(self.mPath, 'a') as f:
+                f.write(json.dumps(dict(record, kind=kind)) + '\n')
+
+    def on_batch_end(self, net, record):
+        if self.mBatches is not None:
+            self.mBatches.append(record)
+            self._write('batch', record)
+
+    def on_epoch_end(self, net, record):
+        self.mEpochs.append(record)
+        self._write('epoch', record)
+
+class EarlyStopping(Callback):
+    def __init__(self, validation_data, patience=3, min_delta=0, target=None, restore_best=True):
+        """
+        Evaluate the network on validation_data after every epoch and stop
+        training if the number of correct results has not improved by more
+        than min_delta for patience epochs, or if it has reached target.
+        The number of correct validation results and the time needed to
+        compute it are added to the epoch record as validation and as the
+        phase validation.  The parameters of the best epoch are copied into
+        the preallocated arrays mBest.  If restore_best is True, they are
+        copied back into the network at the end of training.
+        """
+        self.mValidation  = validation_data
+        self.mPatience    = patience
+        self.mMinDelta    = min_delta
+        self.mTarget      = target
+        self.mRestoreBest = restore_best
+        self.mBest        = None
+        self.mBestCorrect = -1
+        self.mBestEpoch   = None
+        self.mWait        = 0
+
+    def on_epoch_end(self, net, record):
+        start   = time.perf_counter()
+        correct = net.evaluate(self.mValidation)
+        record['validation']      = correct
+        record['validation_size'] = len(self.mValidation)
+        record['phases']['validation'] = time.perf_counter() - start
+        if correct > self.mBestCorrect + self.mMinDelta:
+            if self.mBest is None:
+                self.mBest = [np.empty_like(P) for P in net.parameters()]
+            for B, P in zip(self.mBest, net.parameters()):
+                np.copyto(B, P)
+            self.mBestCorrect = correct
+            self.mBestEpoch   = record['epoch']
+            self.mWait        = 0
+        else:
+            self.mWait += 1
+        if self.mTarget is not None and correct >= self.mTarget:
+            return True
+        return self.mWait >= self.mPatience
+
+    def on_train_end(self, net):
+        if self.mRestoreBest and self.mBest is not None:
+            for P, B in zip(net.parameters(), self.mBest):
+                np.copyto(P, B)
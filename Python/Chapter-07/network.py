@@ -1,112 +1,726 @@
-import random
+import json
+import os
+import shutil
+import time
+import multiprocessing
 import numpy as np
 
-def rndMatrix(rows, cols):
+from multiprocessing import shared_memory
+
+from activations import ACTIVATIONS
+from callbacks   import PrintProgress, PHASES
+from optimizers  import SGD
+from pipeline    import TrainingSet, as_training_set
+
+def rndMatrix(rows, cols, dtype=np.float32):
     """
-    Return a matrix of dimension (rows, cols).
+    Return a matrix of dimension (rows, cols) with entries of type dtype.
 
     This matrix is filled with random numbers that have a Gaussian distribution
     with mean 0 and variation 1 / rows.
     """
-    return np.random.randn(rows, cols) / np.sqrt(cols)
-
-def sigmoid(x):
-    "Compute the sigmoid function."
-    return 1.0 / (1.0 + np.exp(-x))
-
-def sigmoid_prime(x):
-    "Compute the derivative of the sigmoid function."
-    s = sigmoid(x)
-    return s * (1 - s)
+    return (np.random.randn(rows, cols) / np.sqrt(cols)).astype(dtype)
 
 class Network(object):
-    def __init__(self, hiddenSize):
-        """
-        Create a neural network with one hidden layer of size hiddenSize.
-        The number of inputs is 28 * 28, the number of outputs is 10.
-        """
-        self.mInputSize  = 28 * 28
-        self.mHiddenSize = hiddenSize
-        self.mOutputSize = 10
-        self.mBiasesH    = np.zeros((self.mHiddenSize, 1))   # biases hidden layer
-        self.mBiasesO    = np.zeros((self.mOutputSize, 1))   # biases output layer
-        self.mWeightsH   = rndMatrix(self.mHiddenSize, self.mInputSize)  # weights hidden layer
-        self.mWeightsO   = rndMatrix(self.mOutputSize, self.mHiddenSize) # weights output layer
+    def __init__(self, sizes, dtype=np.float32, activations=None):
+        """
+        Create a neural network whose layers have the given sizes.  sizes[0]
+        is the number of inputs, sizes[-1] the number of outputs.  If sizes
+        is a number h, the network has 28 * 28 inputs, one hidden layer of
+        size h and 10 outputs.  activations is the list of the names of the
+        activation functions of the layers after the input layer, see the
+        module activations.  By default, every layer uses the sigmoid 
+        function.  The cost function is the cross-entropy, so the output
+        layer has to use either sigmoid or softmax.  
         
+        All parameters are stored as arrays of type dtype.  mBiases[l] and
+        mWeights[l] are the biases and the weights of the layer l+1.  The
+        gradients are accumulated in the preallocated arrays mGradients, 
+        while mWorkspace maps a mini-batch size m to the buffers that 
+        backprop needs for a mini-batch of that size.  mOptimizer is the
+        optimizer that updates the parameters, see the module optimizers.
+        """
+        if isinstance(sizes, int):
+            sizes = [28 * 28, sizes, 10]
+        if activations is None:
+            activations = ['sigmoid'] * (len(sizes) - 1)
+        _check_layers(sizes, activations)
+        Gains   = [ACTIVATIONS[name].gain for name in activations]
+        Biases  = [np.zeros((n, 1), dtype=dtype) for n in sizes[1:]]
+        Weights = [rndMatrix(n, k, dtype) for k, n in zip(sizes[:-1], sizes[1:])]
+        for Wl, gain in zip(Weights, Gains):
+            if gain != 1.0:
+                Wl *= gain
+        self._setup(sizes, activations, dtype, Biases + Weights)
+
+    def _setup(self, sizes, activations, dtype, Params):
+        """
+        Initialize the network with the layer sizes, the names of the 
+        activation functions and the parameters Params, which are listed
+        in the order of the method parameters.
+        """
+        _check_layers(sizes, activations)
+        self.mSizes       = list(sizes)
+        self.mActivations = list(activations)
+        self.mFunctions   = [ACTIVATIONS[name] for name in activations]
+        self.mInputSize   = sizes[0]
+        self.mOutputSize  = sizes[-1]
+        self.mDtype       = np.dtype(dtype)
+        self._set_parameters(Params)
+        self.mGradients   = [np.zeros(P.shape, P.dtype) for P in self.parameters()]
+        self.mWorkspace   = {}
+        self.mOptimizer   = SGD()
+        self.mEpoch       = None
+
+    def parameters(self):
+        """
+        Return the list of the parameters of the network: first the biases
+        of all layers, then the weights of all layers.  For a network with
+        one hidden layer, this is biases hidden layer, biases output layer,
+        weights hidden layer, weights output layer.  This is also the order
+        of the gradients.
+        """
+        return self.mBiases + self.mWeights
+
+    def _set_parameters(self, Params):
+        "Replace the parameters of the network by the arrays in Params."
+        L = len(self.mSizes) - 1
+        self.mBiases  = list(Params[:L])
+        self.mWeights = list(Params[L:])
+
+    def workspace(self, m):
+        """
+        Return the buffers needed by backprop for a mini-batch of size m.
+        These are the inputs X, the desired outputs Y, the list A of the
+        activations of the layers, the list E of the errors of the hidden
+        layers and the list T of scratch matrices, one for every layer.
+        The buffers are allocated once per mini-batch size and reused.
+        """
+        W = self.mWorkspace.get(m)
+        if W is None:
+            dtype, Sizes = self.mDtype, self.mSizes[1:]
+            W = { 'X': np.empty((self.mInputSize,  m), dtype),
+                  'Y': np.empty((self.mOutputSize, m), dtype),
+                  'A': [np.empty((n, m), dtype) for n in Sizes],
+                  'E': [np.empty((n, m), dtype) for n in Sizes[:-1]],
+                  'T': [np.empty((n, m), dtype) for n in Sizes]
+                }
+            self.mWorkspace[m] = W
+        return W
+
     def feedforward(self, x):
         """
         Compute the output of the NN if the input is the vector x.
         """
-        AH = sigmoid(self.mWeightsH @ x  + self.mBiasesH) # hidden layer
-        AO = sigmoid(self.mWeightsO @ AH + self.mBiasesO) # output layer
-        return AO
+        A = x
+        for Wl, bl, f in zip(self.mWeights, self.mBiases, self.mFunctions):
+            A = Wl @ A + bl
+            f.forward(A, np.empty_like(A))
+        return A
     
-    def sgd(self, training_data, epochs, mbs, eta, test_data):
+    def sgd(self, training_data, epochs, mbs, eta, test_data, 
+            checkpoint=None, checkpoint_every=1, callbacks=None, evaluate_every=1,
+            optimizer=None, prefetch=0):
         """
         Train the neural network using mini-batch stochastic gradient descent.  
 
-          epochs: number of epochs
-          mbs:    minibatch size
-          eta:    learning rate
+          epochs:           number of epochs
+          mbs:              minibatch size
+          eta:              learning rate, either a number or a schedule
+          checkpoint:       directory for checkpoints or None
+          checkpoint_every: number of epochs between two checkpoints
+          callbacks:        list of callbacks, see the module callbacks
+          evaluate_every:   number of epochs between two evaluations
+          optimizer:        optimizer from the module optimizers or None
+          prefetch:         number of mini-batches gathered in advance
 
         The training_data is a list of tuples of the form (x, y) where x is an 
         input and y is the desired output. Concretely, x is a vector of size
-        784 and y is a vector of size 10.
+        mInputSize and y is a vector of size mOutputSize.  It can also be a
+        TrainingSet from the module pipeline, otherwise it is converted into
+        one.  In every epoch, a permutation of the indices is drawn with
+        np.random and the mini-batches are gathered from the TrainingSet in
+        this order.  If prefetch is positive, they are gathered by a
+        background thread.
+
+        A schedule is a function mapping the number of an epoch to the 
+        learning rate of this epoch.  If optimizer is given, it replaces
+        mOptimizer, which is plain SGD by default.
+
+        If checkpoint is given, the network is saved there after every 
+        checkpoint_every epochs and after the last epoch, together with the
+        state of mOptimizer and of np.random.  If the directory already
+        contains a checkpoint, training resumes with the parameters, the
+        optimizer state and the random state of this checkpoint at the 
+        epoch following it, so it continues exactly as the interrupted run
+        would have.  The state of the callbacks is not stored.
+
+        The network is evaluated on test_data after every evaluate_every
+        epochs and after the last epoch.  If evaluate_every or test_data is
+        None, it is never evaluated.  After every mini-batch, the method
+        on_batch_end of every callback is called with the network and a
+        batch record, after every epoch on_epoch_end is called with an
+        epoch record.  The records are described in the module callbacks.
+        If on_epoch_end returns True, training stops.  At the end of
+        training, on_train_end is called with the network.  By default, the
+        only callback is PrintProgress, which prints the number of correct
+        test results.
+        """
+        self._check_trainable()
+        if callbacks is None:
+            callbacks = [PrintProgress()]
+        if optimizer is not None:
+            self.mOptimizer = optimizer
+        data   = as_training_set(training_data, self.mDtype)
+        n      = len(data)
+        start  = 0
+        if checkpoint is not None and os.path.exists(checkpoint):
+            start = self._resume(checkpoint)
+        needs_norm = any(getattr(callback, 'needs_grad_norm', False) for callback in callbacks)
+        for j in range(start, epochs):
+            rate   = eta(j) if callable(eta) else eta
+            Phases = dict.fromkeys(PHASES, 0.0)
+            begin  = time.perf_counter()
+            Perm   = np.random.permutation(n)
+            t0     = time.perf_counter()
+            Phases['shuffle'] += t0 - begin
+            for i, (X, Y) in enumerate(data.batches(mbs, Perm, prefetch, self.mDtype)):
+                m  = X.shape[1]
+                W  = self.workspace(m)
+                t1 = time.perf_counter()
+                self._forward(X, W)
+                t2 = time.perf_counter()
+                self._backward(X, Y, W)
+                t3 = time.perf_counter()
+                norm, tn = None, t3
+                if needs_norm:
+                    norm = self.gradient_norm() / m
+                    tn   = time.perf_counter()
+                self._update(rate, m)
+                t4 = time.perf_counter()
+                Phases['batching' ] += t1 - t0
+                Phases['forward'  ] += t2 - t1
+                Phases['backward' ] += t3 - t2
+                Phases['grad_norm'] += tn - t3
+                Phases['update'   ] += t4 - tn
+                t0 = t4
+                for callback in callbacks:
+                    callback.on_batch_end(self, { 'epoch': j, 'batch': i, 'size': m,
+                                                  'grad_norm': norm, 'seconds': t4 - t1 })
+            if checkpoint is not None and ((j + 1) % checkpoint_every == 0 or j + 1 == epochs):
+                self.save(checkpoint, epoch=j, training=True)
+            if self._end_epoch(j, epochs, n, begin, Phases, test_data, evaluate_every, callbacks):
+                break
+        for callback in callbacks:
+            callback.on_train_end(self)
+
+    def _check_trainable(self):
+        """
+        Raise a ValueError if the parameters are read-only, which is the
+        case for a network that has been loaded with mmap = True.
+        """
+        if not all(P.flags.writeable for P in self.parameters()):
+            raise ValueError('the parameters of this network are read-only, '
+                             'load it with mmap=False to train it')
+
+    def _end_epoch(self, j, epochs, n, begin, Phases, test_data, evaluate_every, callbacks):
+        """
+        Finish the epoch j of training on n samples that has started at the
+        time begin: evaluate the network if this is due, create the epoch
+        record and pass it to the callbacks.  Return True if one of the 
+        callbacks asks to stop training.
+        """
+        correct = None
+        size    = 0 if test_data is None else len(test_data)
+        due     = evaluate_every is not None and ((j + 1) % evaluate_every == 0 or j + 1 == epochs)
+        if test_data is not None and due:
+            t0 = time.perf_counter()
+            correct = self.evaluate(test_data)
+            Phases['evaluation'] = time.perf_counter() - t0
+        seconds = time.perf_counter() - begin
+        train   = seconds - Phases.get('evaluation', 0.0)
+        record  = { 'epoch': j, 'samples': n, 'seconds': seconds, 
+                    'samples_per_sec': n / train if train > 0 else None,
+                    'phases': Phases, 'correct': correct, 'test_size': size }
+        return any([callback.on_epoch_end(self, record) for callback in callbacks])
+
+    def _resume(self, checkpoint):
+        """
+        Copy the parameters stored in the directory checkpoint into the
+        network and return the number of the epoch to continue with.  If
+        the checkpoint contains the state of the optimizer and of np.random,
+        they are restored, too.  The optimizer of the checkpoint has to be
+        of the same class as mOptimizer.
+        """
+        saved = Network.load(checkpoint)
+        if saved.mSizes != self.mSizes or saved.mActivations != self.mActivations:
+            raise ValueError(f'checkpoint {checkpoint} has layers {saved.mSizes} with activations '
+                             f'{saved.mActivations}, expected {self.mSizes} with {self.mActivations}')
+        for P, Q in zip(self.parameters(), saved.parameters()):
+            P[...] = Q
+        with open(os.path.join(checkpoint, 'network.json')) as f:
+            meta = json.load(f)
+        if 'optimizer' in meta:
+            name = type(self.mOptimizer).__name__
+            if meta['optimizer'] != name:
+                raise ValueError(f'checkpoint {checkpoint} has been trained with {meta["optimizer"]}, '
+                                 f'but the optimizer is {name}')
+            State = { key: np.load(os.path.join(checkpoint, f'Optimizer-{key}.npy'))
+                      for key in meta['optimizer_state'] }
+            self.mOptimizer.set_state(State)
+        if 'random' in meta:
+            algorithm, pos, has_gauss, cached = meta['random']
+            keys = np.load(os.path.join(checkpoint, 'RandomKeys.npy'))
+            np.random.set_state((algorithm, keys, pos, has_gauss, cached))
+        return 0 if saved.mEpoch is None else saved.mEpoch + 1
+
+    def parameter_names(self):
+        "Return the names of the files that store the parameters."
+        L = len(self.mSizes) - 1
+        return [f'Biases{l}' for l in range(L)] + [f'Weights{l}' for l in range(L)]
+
+    def save(self, path, epoch=None, training=False):
+        """
+        Save the network in the directory path.  Every parameter is stored
+        uncompressed in its own .npy file, so that it can be memory-mapped
+        by load.  The sizes of the layers, the activations, the dtype and
+        epoch are stored in the file network.json.  If training is True,
+        the arrays of the state of mOptimizer are stored in the files
+        Optimizer-<name>.npy and the state of np.random in RandomKeys.npy
+        and network.json, so that sgd can resume training exactly.  These
+        files are ignored by load.  The network is first
+        written into a temporary directory that then replaces path, so an
+        interrupted save never leaves a partially written network behind.
+        """
+        path = os.path.normpath(path)
+        tmp  = path + '.tmp'
+        old  = path + '.old'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, P in zip(self.parameter_names(), self.parameters()):
+            np.save(os.path.join(tmp, name + '.npy'), P)
+        meta = { 'format'      : 2,
+                 'sizes'       : self.mSizes,
+                 'activations' : self.mActivations,
+                 'dtype'       : self.mDtype.str,
+                 'epoch'       : epoch
+               }
+        if training:
+            State = self.mOptimizer.state()
+            for key, A in State.items():
+                np.save(os.path.join(tmp, f'Optimizer-{key}.npy'), A)
+            algorithm, keys, pos, has_gauss, cached = np.random.get_state()
+            np.save(os.path.join(tmp, 'RandomKeys.npy'), keys)
+            meta['optimizer']       = type(self.mOptimizer).__name__
+            meta['optimizer_state'] = list(State)
+            meta['random']          = [algorithm, int(pos), int(has_gauss), float(cached)]
+        with open(os.path.join(tmp, 'network.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        if os.path.exists(path):
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a network that has been saved with save in the directory path.
+        If mmap is True, the parameters are memory-mapped read-only, so 
+        they are only read from disk when they are used and all processes
+        that load the same network share one copy of them.  Such a network
+        can make predictions, but training it raises a ValueError.  If mmap
+        is False, the parameters are read into writable arrays.  The
+        attribute mEpoch is the epoch that has been stored by save.
+        Networks with one sigmoid hidden layer that have been saved in the
+        first format, which stores the sizes of the three layers, can be
+        loaded, too.
+        """
+        with open(os.path.join(path, 'network.json')) as f:
+            meta = json.load(f)
+        if meta['format'] == 1:
+            sizes       = [meta['inputSize'], meta['hiddenSize'], meta['outputSize']]
+            activations = ['sigmoid', 'sigmoid']
+            Names       = ['BiasesH', 'BiasesO', 'WeightsH', 'WeightsO']
+        else:
+            sizes       = meta['sizes']
+            activations = meta['activations']
+            L           = len(sizes) - 1
+            Names       = [f'Biases{l}' for l in range(L)] + [f'Weights{l}' for l in range(L)]
+        Params = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+                  for name in Names]
+        net = cls.__new__(cls)
+        net._setup(sizes, activations, meta['dtype'], Params)
+        net.mEpoch = meta['epoch']
+        return net
+
+    def sgd_parallel(self, training_data, epochs, mbs, eta, test_data, workers=None,
+                     checkpoint=None, checkpoint_every=1, callbacks=None, evaluate_every=1,
+                     optimizer=None):
+        """
+        Train the neural network using data-parallel mini-batch stochastic
+        gradient descent with the given number of worker processes.  The
+        arguments are the same as for sgd, but mbs is the size of the global
+        mini-batch that is split evenly among the workers.  The epoch records
+        passed to the callbacks have the phases shuffle, workers, update and
+        evaluation, where workers is the time spent waiting for the workers.
+        on_batch_end is not called.  Checkpoints are written and resumed as
+        in sgd.
+
+        The training data, the parameters, the gradients of the workers and
+        the permutation of the training data are stored in shared memory.  For 
+        every step, a worker only receives the range of the permutation that
+        makes up its part of the mini-batch.  The gradients of the workers are
+        summed in the order of the workers, so for a fixed seed of
+        np.random and a fixed number of workers the result is deterministic.
+        If there is not enough free shared memory, a MemoryError is raised
+        before anything is allocated.  If a worker process dies, a
+        RuntimeError is raised.  The shared memory is released in any case
+        and workers that are still alive are terminated.
         """
-        n_test = len(test_data)
-        n      = len(training_data)
-        for j in range(epochs):
-            random.shuffle(training_data)
-            mini_batches = [training_data[k : k+mbs] for k in range(0, n, mbs)]
-            for mini_batch in mini_batches:
-                self.update_mini_batch(mini_batch, eta)    
-            print(f"Epoch {j}: {self.evaluate(test_data)} / {n_test}")
+        self._check_trainable()
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if callbacks is None:
+            callbacks = [PrintProgress()]
+        if optimizer is not None:
+            self.mOptimizer = optimizer
+        start  = 0
+        if checkpoint is not None and os.path.exists(checkpoint):
+            start = self._resume(checkpoint)
+        data   = as_training_set(training_data, self.mDtype)
+        n      = len(data)
+        Shapes = [P.shape for P in self.parameters()]
+        total  = _total(Shapes)
+        itemsize = self.mDtype.itemsize
+        _check_shared_memory(itemsize * n * (self.mInputSize + self.mOutputSize)
+                             + 8 * n + itemsize * (workers + 1) * total)
+        Blocks = []
+        def share(shape, dtype):
+            size  = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            block = shared_memory.SharedMemory(create=True, size=size)
+            Blocks.append(block)
+            return np.ndarray(shape, dtype, buffer=block.buf)
+        X = Y = Perm = Params = Grads = None
+        Pipes, Processes = [], []
+        try:
+            X      = share((n, self.mInputSize ), self.mDtype)
+            Y      = share((n, self.mOutputSize), self.mDtype)
+            Perm   = share((n,), np.int64)
+            Params = _views(share((total,), self.mDtype), Shapes)
+            Grads  = [_views(G, Shapes) for G in share((workers, total), self.mDtype)]
+            X[...], Y[...] = data.arrays(self.mDtype)
+            for P, Q in zip(Params, self.parameters()):
+                P[...] = Q
+            self._set_parameters(Params)
+            Names = [block.name for block in Blocks]
+            for w in range(workers):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_train_worker,
+                              args=(child, Names, n, self.mSizes, self.mActivations,
+                                    self.mDtype.str, w, workers))
+                process.start()
+                child.close()   # so that recv raises EOFError if the worker dies
+                Pipes.append(parent)
+                Processes.append(process)
+            for j in range(start, epochs):
+                rate    = eta(j) if callable(eta) else eta
+                Phases  = { 'shuffle': 0.0, 'workers': 0.0, 'update': 0.0, 'evaluation': 0.0 }
+                begin   = time.perf_counter()
+                Perm[:] = np.random.permutation(n)
+                t0      = time.perf_counter()
+                Phases['shuffle'] = t0 - begin
+                for k in range(0, n, mbs):
+                    m = min(mbs, n - k)
+                    try:
+                        for w, pipe in enumerate(Pipes):
+                            pipe.send((k + m * w // workers, k + m * (w+1) // workers))
+                        for pipe in Pipes:
+                            pipe.recv()
+                    except (BrokenPipeError, ConnectionResetError, EOFError) as error:
+                        Codes = [process.exitcode for process in Processes]
+                        raise RuntimeError(f'a worker process has died, exit codes {Codes}') from error
+                    t1 = time.perf_counter()
+                    for i, G in enumerate(self.mGradients):
+                        np.copyto(G, Grads[0][i])
+                        for w in range(1, workers):
+                            G += Grads[w][i]
+                    self._update(rate, m)
+                    t2 = time.perf_counter()
+                    Phases['workers'] += t1 - t0
+                    Phases['update' ] += t2 - t1
+                    t0 = t2
+                if checkpoint is not None and ((j + 1) % checkpoint_every == 0 or j + 1 == epochs):
+                    self.save(checkpoint, epoch=j, training=True)
+                if self._end_epoch(j, epochs, n, begin, Phases, test_data, evaluate_every, callbacks):
+                    break
+            for callback in callbacks:
+                callback.on_train_end(self)
+        finally:
+            try:
+                self._set_parameters([P.copy() for P in self.parameters()])
+                for pipe in Pipes:
+                    try:
+                        pipe.send(None)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                    pipe.close()
+                for process in Processes:
+                    process.join(1.0)
+                    if process.is_alive():
+                        process.terminate()
+                        process.join()
+            finally:
+                del X, Y, Perm, Params, Grads
+                for block in Blocks:
+                    block.close()
+                    block.unlink()
 
     def update_mini_batch(self, mini_batch, eta):
-        nabla_BH = np.zeros((self.mHiddenSize, 1))  # gradient of biases  of hidden layer
-        nabla_BO = np.zeros((self.mOutputSize, 1))  # gradient of biases  of output layer
-        nabla_WH = np.zeros((self.mHiddenSize, self.mInputSize))  # gradient of weights of hidden layer
-        nabla_WO = np.zeros((self.mOutputSize, self.mHiddenSize)) # gradient of weights of output layer
-        for x, y in mini_batch:
-            dltNbl_BH, dltNbl_BO, dltNbl_WH, dltNbl_WO = self.backprop(x, y)
-            nabla_BH += dltNbl_BH
-            nabla_BO += dltNbl_BO
-            nabla_WH += dltNbl_WH
-            nabla_WO += dltNbl_WO      
-        alpha = eta / len(mini_batch)
-        self.mBiasesH  -= alpha * nabla_BH
-        self.mBiasesO  -= alpha * nabla_BO
-        self.mWeightsH -= alpha * nabla_WH
-        self.mWeightsO -= alpha * nabla_WO
+        """
+        Perform one step of gradient descent for the training data in
+        mini_batch.  The inputs of the mini-batch are copied into the
+        matrix X of shape (mInputSize, m) and the desired outputs into the
+        matrix Y of shape (mOutputSize, m), where m is the size of the
+        mini-batch.  Both matrices are taken from the workspace.  Then the
+        gradients for the whole mini-batch are computed by a single call of
+        _backprop and the parameters are updated in place.
+        """
+        X, Y, W = self._stack(mini_batch)
+        self._backprop(X, Y, W)
+        self._update(eta, len(mini_batch))
+
+    def _stack(self, mini_batch):
+        """
+        Copy the inputs and the desired outputs of mini_batch into the 
+        matrices X and Y of the workspace W for its size.  Return X, Y, W.
+        """
+        W = self.workspace(len(mini_batch))
+        X = np.concatenate([x for x, _ in mini_batch], axis=1, out=W['X'])
+        Y = np.concatenate([y for _, y in mini_batch], axis=1, out=W['Y'])
+        return X, Y, W
+
+    def _update(self, eta, m):
+        """
+        Update the parameters in place with mOptimizer using the gradients
+        in mGradients, which are the sums of the gradients of the m inputs
+        of a mini-batch.  The learning rate is eta.
+        """
+        self.mOptimizer.step(self.parameters(), self.mGradients, eta, m)
+
+    def gradient_norm(self):
+        """
+        Return the Euclidean norm of the gradients stored in mGradients,
+        where all parameters are viewed as one vector.
+        """
+        return float(np.sqrt(sum(np.vdot(G, G) for G in self.mGradients)))
     
-    def backprop(self, x, y):
+    def backprop(self, X, Y):
         """
         Backpropagation to calculate the gradient for the cost function
-          x: training inputs
-          y: correct result for inputs x
-        """
-        # feedforward pass
-        ZH = self.mWeightsH @ x  + self.mBiasesH
-        AH = sigmoid(ZH)
-        ZO = self.mWeightsO @ AH + self.mBiasesO
-        AO = sigmoid(ZO)
-        # backwards pass, output layer
-        epsilonO = (AO - y) # * sigmoid_prime(ZO)
-        nabla_BO = epsilonO
-        nabla_WO = epsilonO @ AH.transpose()
-        # backwards pass, hidden layer
-        epsilonH = (self.mWeightsO.transpose() @ epsilonO) * sigmoid_prime(ZH)
-        nabla_BH = epsilonH
-        nabla_WH = epsilonH @ x.transpose()
-        return (nabla_BH, nabla_BO, nabla_WH, nabla_WO)
+          X: training inputs, one column per input
+          Y: correct results for the inputs X, one column per input
+        X can be a single input of shape (mInputSize, 1) or a mini-batch of
+        shape (mInputSize, m).  In the latter case, all products are
+        matrix-matrix products and the returned gradients are the sums of
+        the gradients of the individual inputs.  The gradients are returned
+        as new arrays.
+        """
+        self._backprop(X, Y, self.workspace(X.shape[1]))
+        return tuple(G.copy() for G in self.mGradients)
+
+    def _backprop(self, X, Y, W):
+        """
+        Compute the gradients for the inputs X and the desired outputs Y and
+        store them in mGradients.  W is the workspace for the size of X.
+        Every intermediate result is written into a buffer of W, so no
+        array is allocated.
+        """
+        self._forward(X, W)
+        self._backward(X, Y, W)
+
+    def _forward(self, X, W):
+        """
+        Feedforward pass: store the activations of the layers for the
+        inputs X in the buffers A of W.  For every layer, the weighted
+        input is computed directly in the buffer of its activation, which
+        is then overwritten by the activation function.
+        """
+        A = X
+        for Wl, bl, f, Al, Tl in zip(self.mWeights, self.mBiases, self.mFunctions, W['A'], W['T']):
+            np.matmul(Wl, A, out=Al)
+            Al += bl
+            f.forward(Al, Tl)
+            A = Al
+
+    def _backward(self, X, Y, W):
+        """
+        Backwards pass: compute the gradients from the activations stored
+        by _forward.  As the cost is the cross-entropy and the output layer
+        uses sigmoid or softmax, the error of the output layer is A - Y.
+        The error of a hidden layer is computed from the error of the next
+        layer and the derivative of its activation function, which only
+        needs its activation.
+        """
+        L       = len(self.mWeights)
+        nabla_B = self.mGradients[:L]
+        nabla_W = self.mGradients[L:]
+        A, E, T = W['A'], W['E'], W['T']
+        epsilon = np.subtract(A[-1], Y, out=A[-1])
+        for l in range(L - 1, -1, -1):
+            Aprev = A[l-1] if l > 0 else X
+            np.sum(epsilon, axis=1, keepdims=True, out=nabla_B[l])
+            np.matmul(epsilon, Aprev.T, out=nabla_W[l])
+            if l > 0:
+                epsilon = np.matmul(self.mWeights[l].T, epsilon, out=E[l-1])
+                self.mFunctions[l-1].backward(epsilon, Aprev, T[l-1])
     
-    # Returns sum of correct guesses after feedforwarding
-    def evaluate(self, test_data):
+    def predict_proba_batch(self, X, chunk_size=1024):
+        """
+        Compute the output of the NN for every row of the matrix X.
+          X:          inputs of shape (n, mInputSize), one row per input
+          chunk_size: number of rows that are fed forward at once
+        The result is a matrix of shape (n, mOutputSize) whose i-th row contains the
+        activations of the output layer for the input X[i].  The rows are
+        processed in chunks, so the activations of the layers never need
+        more memory than chunk_size inputs.
+        """
+        X = np.asarray(X).reshape(-1, self.mInputSize)
+        n = X.shape[0]
+        c = max(1, min(n, chunk_size))
+        P = np.empty((n, self.mOutputSize), dtype=self.mDtype)
+        B = [np.empty((k, c), dtype=self.mDtype) for k in self.mSizes[1:]]
+        S = np.empty((1, c), dtype=self.mDtype)
+        for k in range(0, n, chunk_size):
+            A  = X[k : k+chunk_size].T
+            ck = A.shape[1]
+            for Wl, bl, f, Bl in zip(self.mWeights, self.mBiases, self.mFunctions, B):
+                Al = Bl[:, :ck]
+                np.matmul(Wl, A, out=Al)
+                Al += bl
+                f.forward(Al, S[:, :ck])
+                A = Al
+            P[k : k+ck] = A.T
+        return P
+
+    def predict_batch(self, X, chunk_size=1024):
+        """
+        Return an array of length n that contains the class predicted for
+        every row of the matrix X of shape (n, mInputSize).  The predicted
+        class is the index of the output neuron with the highest activation.
+        """
+        return np.argmax(self.predict_proba_batch(X, chunk_size), axis=1)
+
+    def evaluate(self, test_data, chunk_size=1024):
         """
         Return the number of test inputs for which the neural
         network outputs the correct result. Note that the neural
         network's output is assumed to be the index of whichever
         neuron in the final layer has the highest activation.
+        The inputs are stacked into a matrix of shape (n, mInputSize) and
+        classified by predict_batch.  test_data can also be a TrainingSet,
+        which is classified in chunks of chunk_size inputs.
         """
-        test_results = [(np.argmax(self.feedforward(x)), y) for (x, y) in test_data]
-        return sum(int(x == y) for (x, y) in test_results)
+        if isinstance(test_data, TrainingSet):
+            y, k, correct = test_data.labels(), 0, 0
+            for Xk in test_data.chunks(chunk_size, self.mDtype):
+                correct += np.count_nonzero(self.predict_batch(Xk, chunk_size) == y[k : k+len(Xk)])
+                k       += len(Xk)
+            return int(correct)
+        X = np.array([x.ravel() for x, _ in test_data])
+        y = np.fromiter((y for _, y in test_data), dtype=np.int64, count=len(test_data))
+        return int(np.count_nonzero(self.predict_batch(X, chunk_size) == y))
+
+def _check_layers(sizes, activations):
+    """
+    Raise a ValueError if the layer sizes and the names of the activation
+    functions do not describe a network that can be trained with the
+    cross-entropy cost.
+    """
+    if len(sizes) < 2:
+        raise ValueError('a network needs at least an input and an output layer')
+    if len(activations) != len(sizes) - 1:
+        raise ValueError(f'{len(sizes) - 1} layers, but {len(activations)} activations')
+    for name in activations:
+        if name not in ACTIVATIONS:
+            raise ValueError(f'unknown activation {name!r}')
+    if 'softmax' in activations[:-1]:
+        raise ValueError('softmax can only be used in the output layer')
+    if activations[-1] not in ('sigmoid', 'softmax'):
+        raise ValueError('the output layer has to use sigmoid or softmax')
+
+def _check_shared_memory(size):
+    """
+    Raise a MemoryError if the directory /dev/shm, which holds the shared
+    memory on Linux, has less than size bytes free.  In a Docker container,
+    /dev/shm only has 64 MiB by default, which is less than the MNIST
+    training data need as float32, and running out of it kills the process
+    with SIGBUS instead of raising an exception.  On other systems, nothing
+    is checked.
+    """
+    if not os.path.isdir('/dev/shm'):
+        return
+    free = shutil.disk_usage('/dev/shm').free
+    if size > free:
+        raise MemoryError(f'sgd_parallel needs {size / 2**20:.1f} MiB of shared memory, but '
+                          f'/dev/shm has only {free / 2**20:.1f} MiB free; in Docker, '
+                          f'increase it with --shm-size')
+
+def _total(Shapes):
+    "Return the total number of entries of arrays with the given shapes."
+    return sum(int(np.prod(shape)) for shape in Shapes)
+
+def _views(A, Shapes):
+    """
+    Split the flat array A into consecutive views with the given shapes.
+    """
+    Views, offset = [], 0
+    for shape in Shapes:
+        size = int(np.prod(shape))
+        Views.append(A[offset : offset+size].reshape(shape))
+        offset += size
+    return Views
+
+def _train_worker(pipe, Names, n, sizes, activations, dtype, w, workers):
+    """
+    This function runs in the worker process w of Network.sgd_parallel.
+    Names are the names of the shared memory blocks that hold the inputs,
+    the desired outputs, the permutation of the training data, the
+    parameters and the gradients of all workers.  For every pair (a, b)
+    received from pipe, the worker computes the gradient for the training
+    data Perm[a:b] and writes it into its own part of the gradients.
+    The worker stops when it receives None.
+    """
+    Blocks = [shared_memory.SharedMemory(name=name) for name in Names]
+    Shapes = ([(k, 1) for k in sizes[1:]] +
+              [(k, j) for j, k in zip(sizes[:-1], sizes[1:])])
+    total  = _total(Shapes)
+    X      = np.ndarray((n, sizes[ 0]), dtype, buffer=Blocks[0].buf)
+    Y      = np.ndarray((n, sizes[-1]), dtype, buffer=Blocks[1].buf)
+    Perm   = np.ndarray((n,), np.int64, buffer=Blocks[2].buf)
+    Grads  = np.ndarray((workers, total), dtype, buffer=Blocks[4].buf)
+    net    = Network.__new__(Network)
+    net._setup(sizes, activations, dtype,
+               _views(np.ndarray((total,), dtype, buffer=Blocks[3].buf), Shapes))
+    net.mGradients = _views(Grads[w], Shapes)
+    Rows   = {}   # maps m to the buffers for the rows of X and Y
+    while True:
+        task = pipe.recv()
+        if task is None:
+            break
+        a, b = task
+        m    = b - a
+        if m == 0:
+            Grads[w].fill(0)
+        else:
+            if m not in Rows:
+                Rows[m] = (np.empty((m, net.mInputSize ), dtype), 
+                           np.empty((m, net.mOutputSize), dtype))
+            XR, YR = Rows[m]
+            np.take(X, Perm[a:b], axis=0, out=XR)
+            np.take(Y, Perm[a:b], axis=0, out=YR)
+            net._backprop(XR.T, YR.T, net.workspace(m))
+        pipe.send(True)
+    del X, Y, Perm, Grads, net
+    for block in Blocks:
+        block.close()
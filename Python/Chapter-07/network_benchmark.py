@@ -0,0 +1,70 @@
+"""
+network_benchmark
+~~~~~~~~~~~~~~~~~
+Measure how data-parallel training with Network.sgd_parallel scales with
+the number of worker processes.  The network is trained on random data,
+so that the benchmark does not need the MNIST data set.  For every number
+of workers, it reports the training time, the speedup compared with the
+first number of workers and the scaling efficiency, which is the speedup
+divided by the relative number of workers.  As every worker runs its own
+BLAS, the number of BLAS threads should be limited to one, e.g. by setting
+OPENBLAS_NUM_THREADS=1.  Run it as
+
+    python network_benchmark.py [--workers 1 2 4 8] [--samples 20000]
+                                [--hidden 60] [--mbs 20] [--epochs 2]
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import time
+
+import numpy as np
+
+from network import Network
+
+def random_data(n, seed):
+    "Return n random training pairs (x, y) in the format used by Network.sgd."
+    rng = np.random.default_rng(seed)
+    E   = np.eye(10, dtype=np.float32)
+    return [(rng.random((784, 1), dtype=np.float32), E[:, [rng.integers(10)]])
+            for _ in range(n)]
+
+def scaling_benchmark(Workers, samples, hidden, mbs, epochs, seed=42):
+    """
+    Train a network with hidden neurons for every number of workers in
+    Workers and return a list of pairs (workers, seconds).
+    """
+    training_data = random_data(samples, seed)
+    test_data     = [(x, int(np.argmax(y))) for x, y in training_data[:1000]]
+    Results = []
+    for workers in Workers:
+        np.random.seed(seed)
+        net   = Network(hidden)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            net.sgd_parallel(training_data, epochs, mbs, 0.3, test_data, workers)
+        Results.append((workers, time.perf_counter() - start))
+    return Results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Network.sgd_parallel.')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16, 32][:multiprocessing.cpu_count().bit_length()])
+    parser.add_argument('--samples', type=int, default=20_000)
+    parser.add_argument('--hidden',  type=int, default=60)
+    parser.add_argument('--mbs',     type=int, default=20, help='size of the global mini-batch')
+    parser.add_argument('--epochs',  type=int, default=2)
+    args = parser.parse_args()
+    print(f'{multiprocessing.cpu_count()} cores, {args.samples} samples, '
+          f'hidden size {args.hidden}, global mini-batch {args.mbs}')
+    Results = scaling_benchmark(args.workers, args.samples, args.hidden, args.mbs, args.epochs)
+    w0, t0  = Results[0]
+    for workers, seconds in Results:
+        speedup = t0 / seconds
+        print(f'{workers:3d} workers: {seconds:8.2f} sec, speedup {speedup:5.2f}, '
+              f'efficiency {speedup * w0 / workers:6.1%}')
+
+if __name__ == '__main__':
+    main()
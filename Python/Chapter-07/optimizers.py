@@ -0,0 +1,163 @@
+"""
+optimizers
+~~~~~~~~~~
+Update rules for the parameters of network.Network and schedules for the
+learning rate.  An optimizer has a method
+
+    step(Params, Grads, eta, m)
+
+that updates the list of parameters Params in place.  Grads is the list
+of the sums of the gradients of the m inputs of a mini-batch and eta is
+the learning rate.  The state of an optimizer, e.g. the velocities of
+momentum, is allocated when step is called for the first time and is then
+reused, so that no arrays are allocated during training.  The arrays in
+Grads are used as scratch space and are overwritten.
+
+In addition, an optimizer has the methods state() and set_state(State).
+state() returns a dictionary that maps names to the numpy arrays that make
+up the state of the optimizer, and set_state(State) restores a state that
+has been returned by state().  Network.save uses them to store the state of
+the optimizer in a checkpoint, so that resumed training continues exactly
+where it has stopped.
+
+A schedule is a function that maps the number of an epoch to a learning
+rate.  Network.sgd accepts either a number or a schedule as learning rate.
+"""
+
+import math
+import numpy as np
+
+class SGD(object):
+    "Plain stochastic gradient descent: P = P - eta * g."
+    def step(self, Params, Grads, eta, m):
+        alpha = eta / m
+        for P, G in zip(Params, Grads):
+            G *= alpha
+            P -= G
+
+    def state(self):
+        return {}
+
+    def set_state(self, State):
+        pass
+
+class Momentum(object):
+    def __init__(self, mu=0.9):
+        """
+        Gradient descent with momentum:
+          V = mu * V - eta * g
+          P = P + V
+        The velocities V are stored in the list mVelocities.
+        """
+        self.mMu         = mu
+        self.mVelocities = None
+
+    def step(self, Params, Grads, eta, m):
+        if self.mVelocities is None:
+            self.mVelocities = [np.zeros_like(P) for P in Params]
+        alpha = eta / m
+        for P, G, V in zip(Params, Grads, self.mVelocities):
+            G *= alpha
+            V *= self.mMu
+            V -= G
+            P += V
+
+    def state(self):
+        if self.mVelocities is None:
+            return {}
+        return { f'Velocity{i}': V for i, V in enumerate(self.mVelocities) }
+
+    def set_state(self, State):
+        if State:
+            self.mVelocities = [np.array(State[f'Velocity{i}']) for i in range(len(State))]
+
+class Nesterov(Momentum):
+    """
+    Nesterov's accelerated gradient in the formulation of Bengio et al.:
+      V = mu * V - eta * g
+      P = P + mu * V - eta * g
+    This is equivalent to evaluating the gradient at the look-ahead point
+    P + mu * V, but needs only the gradient at P.
+    """
+    def step(self, Params, Grads, eta, m):
+        if self.mVelocities is None:
+            self.mVelocities = [np.zeros_like(P) for P in Params]
+        alpha = eta / m
+        for P, G, V in zip(Params, Grads, self.mVelocities):
+            G *= alpha
+            V *= self.mMu
+            V -= G
+            P -= G
+            np.multiply(V, self.mMu, out=G)
+            P += G
+
+class Adam(object):
+    def __init__(self, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        """
+        The optimizer Adam of Kingma and Ba.  The first moments are stored
+        in the list mMoments1, the second moments in mMoments2, and mScratch
+        holds one scratch array per parameter.  mSteps is the number of
+        steps that have been taken.  Adam needs a much smaller learning
+        rate than SGD, e.g. eta = 0.001.
+        """
+        self.mBeta1    = beta1
+        self.mBeta2    = beta2
+        self.mEpsilon  = epsilon
+        self.mMoments1 = None
+        self.mMoments2 = None
+        self.mScratch  = None
+        self.mSteps    = 0
+
+    def step(self, Params, Grads, eta, m):
+        if self.mMoments1 is None:
+            self.mMoments1 = [np.zeros_like(P) for P in Params]
+            self.mMoments2 = [np.zeros_like(P) for P in Params]
+            self.mScratch  = [np.empty_like(P) for P in Params]
+        self.mSteps += 1
+        b1, b2 = self.mBeta1, self.mBeta2
+        alpha  = eta * math.sqrt(1 - b2 ** self.mSteps) / (1 - b1 ** self.mSteps)
+        for P, G, M, V, S in zip(Params, Grads, self.mMoments1, self.mMoments2, self.mScratch):
+            G *= 1 / m
+            M *= b1                              # M = b1 * M + (1 - b1) * g
+            np.multiply(G, 1 - b1, out=S)
+            M += S
+            np.multiply(G, G, out=G)             # V = b2 * V + (1 - b2) * g * g
+            G *= 1 - b2
+            V *= b2
+            V += G
+            np.sqrt(V, out=S)                    # P = P - alpha * M / (sqrt(V) + epsilon)
+            S += self.mEpsilon
+            np.divide(M, S, out=S)
+            S *= alpha
+            P -= S
+
+    def state(self):
+        State = { 'Steps': np.array(self.mSteps) }
+        if self.mMoments1 is not None:
+            for i, (M, V) in enumerate(zip(self.mMoments1, self.mMoments2)):
+                State[f'Moment1-{i}'] = M
+                State[f'Moment2-{i}'] = V
+        return State
+
+    def set_state(self, State):
+        self.mSteps = int(State['Steps'])
+        n = (len(State) - 1) // 2
+        if n > 0:
+            self.mMoments1 = [np.array(State[f'Moment1-{i}']) for i in range(n)]
+            self.mMoments2 = [np.array(State[f'Moment2-{i}']) for i in range(n)]
+            self.mScratch  = [np.empty_like(M) for M in self.mMoments1]
+
+def step_decay(eta, factor=0.5, every=10):
+    "Return a schedule that multiplies eta by factor after every epochs."
+    return lambda epoch: eta * factor ** (epoch // every)
+
+def exponential_decay(eta, gamma=0.95):
+    "Return a schedule that multiplies eta by gamma after every epoch."
+    return lambda epoch: eta * gamma ** epoch
+
+def cosine_decay(eta, epochs, eta_min=0.0):
+    """
+    Return a schedule that decreases the learning rate from eta to eta_min
+    along half a period of a cosine in the given number of epochs.
+    """
+    return lambda epoch: eta_min + (eta - eta_min) * (1 + math.cos(math.pi * min(epoch, epochs) / epochs)) / 2
@@ -0,0 +1,181 @@
+"""
+pipeline
+~~~~~~~~
+Feed the training data to Network.sgd.  A TrainingSet stores the inputs
+and the desired outputs in two contiguous arrays with one row per training
+example.  To shuffle the training data, only a permutation of the indices
+is shuffled, and every mini-batch is gathered from the arrays by fancy
+indexing into preallocated buffers.  Optionally, a background thread
+gathers the next mini-batches while the current one is used for training.
+As NumPy releases the GIL while it copies the rows, gathering and training
+overlap.  The inputs may be stored compactly as integers, e.g. as bytes,
+and the desired outputs as labels.  Then every mini-batch is normalised 
+and converted into unit vectors when it is gathered.  A TrainingSet can
+also be passed to Network.evaluate.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+class TrainingSet(object):
+    def __init__(self, X, Y, scale=1.0, classes=10):
+        """
+        Create a training set from the inputs X of shape (n, d) and the
+        desired outputs Y of shape (n, k).  The arrays are stored in mX and
+        mY and are only copied if they are not C-contiguous.  If X has an
+        integer type, every gathered input is multiplied by scale.  Y can
+        also be a vector of shape (n,) containing labels in range(classes).
+        In this case, every gathered label is converted into a unit vector
+        of length classes.
+        """
+        if len(X) != len(Y):
+            raise ValueError(f'{len(X)} inputs, but {len(Y)} outputs')
+        self.mX      = np.ascontiguousarray(X)
+        self.mY      = np.ascontiguousarray(Y)
+        self.mScale  = scale
+        self.mRaw    = not np.issubdtype(self.mX.dtype, np.floating)
+        self.mLabels = self.mY.ndim == 1
+        self.mOutput = classes if self.mLabels else self.mY.shape[1]
+
+    @classmethod
+    def from_pairs(cls, training_data, dtype=np.float32):
+        """
+        Create a training set from a non-empty list of pairs (x, y) where x
+        is a column vector of size d and y is a column vector of size k.
+        The sizes d and k are taken from the first pair.
+        """
+        n    = len(training_data)
+        x, y = training_data[0]
+        X    = np.empty((n, x.size), dtype=dtype)
+        Y    = np.empty((n, y.size), dtype=dtype)
+        for k, (x, y) in enumerate(training_data):
+            X[k] = x.ravel()
+            Y[k] = y.ravel()
+        return cls(X, Y)
+
+    def __len__(self):
+        return len(self.mX)
+
+    def labels(self):
+        "Return the vector of the labels of the training set."
+        return self.mY if self.mLabels else np.argmax(self.mY, axis=1)
+
+    def arrays(self, dtype=np.float32):
+        """
+        Return the inputs and the desired outputs as matrices of type dtype
+        of shape (n, d) and (n, k).  If mX and mY are already stored in 
+        this form, they are returned unchanged.
+        """
+        X, Y = self.mX, self.mY
+        if self.mRaw:
+            X = np.multiply(X, self.mScale, dtype=dtype)
+        if self.mLabels:
+            Y = np.zeros((len(self), self.mOutput), dtype=dtype)
+            Y[np.arange(len(self)), self.mY] = 1.0
+        return X, Y
+
+    def chunks(self, chunk_size, dtype=np.float32):
+        """
+        Generate the inputs in their order as matrices of at most chunk_size
+        rows.  Integer inputs are normalised into a buffer that is reused,
+        so a chunk is only valid until the next one is generated.
+        """
+        B = np.empty((min(chunk_size, len(self)), self.mX.shape[1]), dtype) if self.mRaw else None
+        for k in range(0, len(self), chunk_size):
+            Xk = self.mX[k : k+chunk_size]
+            if self.mRaw:
+                Xk = np.multiply(Xk, B.dtype.type(self.mScale), out=B[:len(Xk)])
+            yield Xk
+
+    def _gather(self, Perm, k, mbs, BX, BY, RX=None):
+        """
+        Copy the rows Perm[k:k+mbs] of mX and mY into the buffers BX and BY.
+        Return the transposed buffers, which have one column per input.  If
+        the inputs are integers, they are first copied into the buffer RX and
+        then normalised into BX.  Labels are converted into unit vectors.
+        """
+        Index = Perm[k : k+mbs]
+        m     = len(Index)
+        if self.mRaw:
+            np.take(self.mX, Index, axis=0, out=RX[:m])
+            np.multiply(RX[:m], BX.dtype.type(self.mScale), out=BX[:m])
+        else:
+            np.take(self.mX, Index, axis=0, out=BX[:m])
+        if self.mLabels:
+            BY[:m] = 0.0
+            BY[np.arange(m), self.mY[Index]] = 1.0
+        else:
+            np.take(self.mY, Index, axis=0, out=BY[:m])
+        return BX[:m].T, BY[:m].T
+
+    def batches(self, mbs, Perm, prefetch=0, dtype=None):
+        """
+        Generate the mini-batches of size mbs of the training set in the order
+        given by the permutation Perm.  Every mini-batch is a pair (X, Y)
+        where X has shape (d, m) and Y has shape (k, m).  These matrices
+        are views of buffers that are reused, so a mini-batch is only valid
+        until the next one is generated.  If prefetch is positive, a
+        background thread gathers up to prefetch mini-batches in advance.
+        dtype is the type of the buffers, by default the type of mX or, if
+        mX has an integer type, numpy.float32.
+        """
+        if dtype is None:
+            dtype = np.float32 if self.mRaw else self.mX.dtype
+        def buffers():
+            return (np.empty((mbs, self.mX.shape[1]), dtype),
+                    np.empty((mbs, self.mOutput), dtype),
+                    np.empty((mbs, self.mX.shape[1]), self.mX.dtype) if self.mRaw else None)
+        if prefetch <= 0:
+            BX, BY, RX = buffers()
+            for k in range(0, len(Perm), mbs):
+                yield self._gather(Perm, k, mbs, BX, BY, RX)
+            return
+        # The consumer uses one buffer, prefetch buffers wait in Queue and
+        # the producer fills one more, so prefetch + 2 buffers suffice.
+        Buffers = [buffers() for _ in range(prefetch + 2)]
+        Queue   = queue.Queue(maxsize=prefetch)
+        stop    = threading.Event()
+        def produce():
+            try:
+                for i, k in enumerate(range(0, len(Perm), mbs)):
+                    batch = self._gather(Perm, k, mbs, *Buffers[i % len(Buffers)])
+                    while not stop.is_set():
+                        try:
+                            Queue.put(batch, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+                    if stop.is_set():
+                        return
+                Queue.put(None)
+            except BaseException as e:
+                Queue.put(e)
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                batch = Queue.get()
+                if batch is None:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            while producer.is_alive():
+                try:
+                    Queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+
+def as_training_set(training_data, dtype=np.float32):
+    """
+    Return training_data if it is a TrainingSet, otherwise convert the list
+    of pairs training_data into a TrainingSet with arrays of type dtype.
+    """
+    if isinstance(training_data, TrainingSet):
+        return training_data
+    return TrainingSet.from_pairs(training_data, dtype)
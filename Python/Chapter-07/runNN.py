@@ -1,12 +1,187 @@
+"""
+runNN
+~~~~~
+Train networks on MNIST.  run() trains the network with one hidden layer
+of 60 neurons that is discussed in the lecture.  Run as a script, this
+module performs a hyperparameter search over the hidden size, the size of
+the mini-batches, the learning rate and the number of epochs:
+
+    python runNN.py [--hidden 30 60 100] [--mbs 10 20] [--eta 0.1 0.3 1.0]
+                    [--epochs 10 30] [--random 20] [--workers 4]
+                    [--results trials.jsonl] [--prune] [--data mnist.pkl.gz]
+
+Without --random, every combination of the given values is tried.  With
+--random n, n configurations are drawn: the learning rate is drawn
+log-uniformly between the smallest and the largest value of --eta, the
+other hyperparameters from the given values.  The trials run in a pool of
+worker processes.  The data set is converted once into the byte cache of
+mnist_loader, which every worker memory-maps, so all workers share one
+copy of the data in the page cache.
+
+For every trial, the accuracy on the validation data after every epoch,
+the time of every epoch, the accuracy on the test data and the peak of
+the memory allocated by the trial are appended as one line of JSON to
+the results file.  With --prune, a trial is stopped after an epoch if its
+validation accuracy is below the median of the accuracies that the other
+trials had after the same epoch.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
 import mnist_loader
 import network
 
+from callbacks import Callback, EarlyStopping, PrintProgress
+from pipeline  import TrainingSet
+
 def run():
     training_data, validation_data, test_data = mnist_loader.load_data()
     net = network.Network(60)
-    net.sgd(training_data, 30, 20, 0.3, test_data)
+    net.sgd(training_data, 30, 20, 0.3, test_data,
+            callbacks=[EarlyStopping(validation_data, patience=5), PrintProgress()])
+
+def grid(Hidden, Mbs, Eta, Epochs):
+    "Return the list of all combinations of the hyperparameters."
+    return [{ 'hidden': h, 'mbs': m, 'eta': e, 'epochs': n }
+            for h, m, e, n in itertools.product(Hidden, Mbs, Eta, Epochs)]
+
+def random_search(Hidden, Mbs, Eta, Epochs, trials, rng):
+    """
+    Return trials random configurations.  The learning rate is drawn
+    log-uniformly from the interval [min(Eta), max(Eta)].
+    """
+    lo, hi = np.log(min(Eta)), np.log(max(Eta))
+    return [{ 'hidden': rng.choice(Hidden), 'mbs': rng.choice(Mbs),
+              'eta': float(np.exp(rng.uniform(lo, hi))), 'epochs': rng.choice(Epochs) }
+            for _ in range(trials)]
+
+# The data set of a worker process, set by _init_worker.
+Data = None
+
+def _init_worker(fileName, Curves):
+    """
+    Load the data set of the worker process.  Curves is a dictionary that
+    is shared by all workers and maps the number of a trial to the list of
+    the validation accuracies of this trial after every epoch so far.
+    """
+    global Data
+    (X, y), (Xv, yv), (Xt, yt) = mnist_loader.load_data_wrapper(fileName)
+    scale = mnist_loader.PIXEL_SCALE
+    Data  = { 'training'  : TrainingSet(X,  y,  scale),
+              'validation': TrainingSet(Xv, yv, scale),
+              'test'      : TrainingSet(Xt, yt, scale),
+              'curves'    : Curves }
+
+class TrialMonitor(Callback):
+    def __init__(self, trial, validation, Curves, prune, warmup=2):
+        """
+        Record the validation accuracy and the time of every epoch, and
+        publish the accuracies as Curves[trial].  If prune is True, ask to
+        stop training if the validation accuracy is below the median of the
+        accuracies of the other trials after the same epoch.  Trials are not
+        pruned during the first warmup epochs, and not as long as fewer than
+        two other trials have reached the epoch.  As every trial only writes
+        its own entry of Curves, no lock is needed.
+        """
+        self.mTrial      = trial
+        self.mValidation = validation
+        self.mCurves     = Curves
+        self.mPrune      = prune
+        self.mWarmup     = warmup
+        self.mAccuracy   = []
+        self.mSeconds    = []
+        self.mPruned     = False
+
+    def on_epoch_end(self, net, record):
+        accuracy = net.evaluate(self.mValidation) / len(self.mValidation)
+        self.mAccuracy.append(accuracy)
+        self.mSeconds .append(record['seconds'])
+        self.mCurves[self.mTrial] = self.mAccuracy
+        epoch  = record['epoch']
+        Others = [Curve[epoch] for trial, Curve in self.mCurves.items()
+                               if trial != self.mTrial and len(Curve) > epoch]
+        if self.mPrune and epoch >= self.mWarmup and len(Others) >= 2:
+            if accuracy < statistics.median(Others):
+                self.mPruned = True
+                return True
+        return False
+
+def run_trial(trial, config, prune=False, seed=42):
+    """
+    Train a network with the hyperparameters in config on the data set of
+    the worker process and return a record of the trial with number trial.
+    """
+    np.random.seed(seed)
+    tracemalloc.start()
+    start   = time.perf_counter()
+    net     = network.Network(config['hidden'])
+    monitor = TrialMonitor(trial, Data['validation'], Data['curves'], prune)
+    net.sgd(Data['training'], config['epochs'], config['mbs'], config['eta'], Data['test'],
+            callbacks=[monitor], evaluate_every=None)
+    test = net.evaluate(Data['test']) / len(Data['test'])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return { 'trial': trial, 'config': config, 'validation': monitor.mAccuracy, 'epoch_seconds': monitor.mSeconds,
+             'test': test, 'peak_bytes': peak, 'pruned': monitor.mPruned, 'seed': seed,
+             'seconds': time.perf_counter() - start, 'pid': os.getpid() }
 
-run()
+def _run_trial(args):
+    return run_trial(*args)
 
+def sweep(Configs, fileName, results, workers, prune=False, seed=42):
+    """
+    Run a trial for every configuration in Configs in a pool of workers and
+    append the records of the trials to the file results.  Return the list
+    of the records, in the order in which the trials have finished.
+    """
+    mnist_loader.load_data_wrapper(fileName)   # build the cache only once
+    Records = []
+    with multiprocessing.Manager() as manager:
+        Curves = manager.dict()
+        with multiprocessing.Pool(workers, _init_worker, (fileName, Curves)) as pool:
+            Tasks = [(trial, config, prune, seed) for trial, config in enumerate(Configs)]
+            for record in pool.imap_unordered(_run_trial, Tasks):
+                with open(results, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+                Records.append(record)
+                best = max(record['validation']) if record['validation'] else 0.0
+                print(f"{record['config']}: validation {best:.4f}, test {record['test']:.4f}, "
+                      f"{record['seconds']:.1f} sec{' (pruned)' if record['pruned'] else ''}")
+    return Records
 
+def main():
+    parser = argparse.ArgumentParser(description='Hyperparameter search for network.Network.')
+    parser.add_argument('--hidden',  type=int,   nargs='+', default=[30, 60, 100])
+    parser.add_argument('--mbs',     type=int,   nargs='+', default=[10, 20])
+    parser.add_argument('--eta',     type=float, nargs='+', default=[0.1, 0.3, 1.0])
+    parser.add_argument('--epochs',  type=int,   nargs='+', default=[10])
+    parser.add_argument('--random',  type=int,   help='number of random configurations')
+    parser.add_argument('--workers', type=int,   default=multiprocessing.cpu_count())
+    parser.add_argument('--results', default='trials.jsonl')
+    parser.add_argument('--prune',   action='store_true')
+    parser.add_argument('--seed',    type=int,   default=42)
+    parser.add_argument('--data',    default='mnist.pkl.gz')
+    args = parser.parse_args()
+    if args.random:
+        Configs = random_search(args.hidden, args.mbs, args.eta, args.epochs, args.random,
+                                random.Random(args.seed))
+    else:
+        Configs = grid(args.hidden, args.mbs, args.eta, args.epochs)
+    Records = sweep(Configs, args.data, args.results, args.workers, args.prune, args.seed)
+    Records.sort(key=lambda r: max(r['validation'], default=0.0), reverse=True)
+    print(f'\nbest of {len(Records)} trials:')
+    for r in Records[:5]:
+        print(f"  {r['config']}: validation {max(r['validation'], default=0.0):.4f}, test {r['test']:.4f}")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Frontier
+~~~~~~~~
+Priority queues for best-first search.  The frontier of a search such as A*
+stores keys of the form (priority, state).  Both classes in this module offer
+the same API, so that one can be replaced by the other:
+
+  * F.insert(k)             adds the key k,
+  * F.delete(k)             removes the key k,
+  * F.member(k), k in F     check whether k is in F,
+  * F.first()               returns the smallest key,
+  * F.pop()                 removes and returns the smallest key,
+  * F.decrease_key(old, new) replaces the key old by the key new,
+  * len(F), F.isEmpty()     return the number of keys or check for emptiness.
+
+SetFrontier is based on the AVL trees of the module Set, HeapFrontier is
+based on the module heapq.
+"""
+
+import heapq
+
+from Set import Set, Nil, _repair
+
+class SetFrontier(object):
+    def __init__(self):
+        """
+        Create an empty frontier.  The keys are stored in the Set mSet,
+        while mFirst caches the smallest key, so that first() does not
+        have to walk down the left spine of the tree.  If the frontier is
+        empty, mFirst is None.
+        """
+        self.mSet   = Set()
+        self.mFirst = None
+
+    def insert(self, key):
+        self.mSet.insert(key)
+        if self.mFirst is None or key < self.mFirst:
+            self.mFirst = key
+
+    def delete(self, key):
+        self.mSet.delete(key)
+        if key == self.mFirst:
+            self.mFirst = self.mSet.first() if self.mSet else None
+
+    def member(self, key):
+        return self.mSet.member(key)
+
+    __contains__ = member
+
+    def first(self):
+        if self.mFirst is None:
+            raise KeyError('first of an empty frontier')
+        return self.mFirst
+
+    def pop(self):
+        """
+        Remove and return the smallest key.  The new smallest key is either
+        the right child of the node that is removed or, if this node has no
+        right child, its parent.  Both are found on the way down, so the
+        left spine of the tree is walked only once.
+        """
+        S    = self.mSet
+        node = S.mRoot
+        if node is Nil:
+            raise KeyError('pop from an empty frontier')
+        Path = []
+        while node.mLeft is not Nil:
+            Path.append(node)
+            node = node.mLeft
+        if node.mRight is not Nil:
+            self.mFirst = node.mRight.mKey
+        elif Path:
+            self.mFirst = Path[-1].mKey
+        else:
+            self.mFirst = None
+        S.mRoot = _repair(Path, [True] * len(Path), node.mRight, -1)
+        return node.mKey
+
+    def decrease_key(self, old, new):
+        """
+        Replace the key old by the key new.  In a search, old and new are
+        pairs (priority, state) and new has a smaller priority.  If old is
+        not in the frontier, a KeyError is raised.
+        """
+        n = len(self.mSet)
+        self.delete(old)
+        if len(self.mSet) == n:
+            raise KeyError(old)
+        self.insert(new)
+
+    def __len__(self):
+        return len(self.mSet)
+
+    def isEmpty(self):
+        return self.mSet.isEmpty()
+
+    def __bool__(self):
+        return bool(self.mSet)
+
+class HeapFrontier(object):
+    def __init__(self):
+        """
+        Create an empty frontier.  The keys are stored in the binary heap
+        mHeap, while the Python set mIndex contains the keys that are
+        currently in the frontier.  Deleting a key only removes it from
+        mIndex.  The stale entry stays in mHeap and is discarded once it
+        reaches the top.  If the stale entries outnumber the valid ones,
+        the heap is rebuilt.
+        """
+        self.mHeap  = []
+        self.mIndex = set()
+
+    def insert(self, key):
+        if key not in self.mIndex:
+            self.mIndex.add(key)
+            heapq.heappush(self.mHeap, key)
+
+    def delete(self, key):
+        if key in self.mIndex:
+            self.mIndex.remove(key)
+            if len(self.mHeap) > 2 * len(self.mIndex) + 16:
+                self.mHeap = list(self.mIndex)
+                heapq.heapify(self.mHeap)
+
+    def member(self, key):
+        return key in self.mIndex
+
+    __contains__ = member
+
+    def _discard_stale(self):
+        "Remove the stale entries from the top of the heap."
+        Heap, Index = self.mHeap, self.mIndex
+        while Heap and Heap[0] not in Index:
+            heapq.heappop(Heap)
+
+    def first(self):
+        self._discard_stale()
+        if not self.mHeap:
+            raise KeyError('first of an empty frontier')
+        return self.mHeap[0]
+
+    def pop(self):
+        self._discard_stale()
+        if not self.mHeap:
+            raise KeyError('pop from an empty frontier')
+        key = heapq.heappop(self.mHeap)
+        self.mIndex.remove(key)
+        return key
+
+    def decrease_key(self, old, new):
+        """
+        Replace the key old by the key new.  If old is not in the frontier,
+        a KeyError is raised.
+        """
+        if old not in self.mIndex:
+            raise KeyError(old)
+        self.delete(old)
+        self.insert(new)
+
+    def __len__(self):
+        return len(self.mIndex)
+
+    def isEmpty(self):
+        return not self.mIndex
+
+    def __bool__(self):
+        return bool(self.mIndex)
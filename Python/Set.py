@@ -1,363 +1,432 @@
 #!/usr/bin/env python
 # coding: utf-8
-# This file has been generated by nbconvert from the file Set.ipynb
+# This file has originally been generated by nbconvert from the file Set.ipynb.
+# It has since been extended and is maintained on its own, so the notebook
+# only covers the basic operations.
 
 # # Sets implemented as AVL Trees
 
 # This notebook implements <em style="color:blue;">sets</em> as <a href="https://en.wikipedia.org/wiki/AVL_tree">AVL trees</a>.  The set $\mathcal{A}$ of <em style="color:blue;">AVL trees</em> is defined inductively:
-# 
+#
 #   - $\texttt{Nil} \in \mathcal{A}$.
-#   - $\texttt{Node}(k,l,r) \in \mathcal{A}\quad$  iff 
+#   - $\texttt{Node}(k,l,r) \in \mathcal{A}\quad$  iff
 #       - $\texttt{Node}(k,l,r) \in \mathcal{B}_<$,
 #       - $l, r \in \mathcal{A}$, and
 #       - $|l.\texttt{height}() - r.\texttt{height}()| \leq 1$.
-# 
+#
 # According to this definition, an AVL tree is an <em style="color:blue;">ordered binary tree</em>
 # such that for every node $\texttt{Node}(k,l,r)$ in this tree the height of the left subtree $l$ and the right
-# subtree  $r$ differ at most by one. 
+# subtree  $r$ differ at most by one.
 
-# The class `Set` represents the nodes of an AVL tree.  This class has the following member variables:
-# 
+# The class `Node` represents the nodes of an AVL tree.  This class has the following member variables:
+#
 #   - `mKey` is the key stored at the root of the tree,
-#   - `mLeft` is the left subtree, 
-#   - `mRight` is the right subtree, and
-#   - `mHeight` is the height.
-# 
-# The constructor `__init__` creates the empty tree.
+#   - `mLeft` is the left subtree,
+#   - `mRight` is the right subtree,
+#   - `mHeight` is the height, and
+#   - `mSize` is the number of keys stored in the tree.
+#
+# As a tree with $n$ keys has $n$ nodes, the class uses `__slots__` so that a node does not carry a
+# dictionary of its own.
+
+# In[1]:
+
+
+from bisect import bisect_left, bisect_right
+
 
 # In[2]:
 
 
-class Set:
-    def __init__(self):
-        self.mKey    = None
-        self.mLeft   = None
-        self.mRight  = None
-        self.mHeight = 0
+class Node:
+    __slots__ = ('mKey', 'mLeft', 'mRight', 'mHeight', 'mSize')
 
+    def __init__(self, key, left, right, height, size):
+        self.mKey    = key
+        self.mLeft   = left
+        self.mRight  = right
+        self.mHeight = height
+        self.mSize   = size
 
-# Given an ordered binary tree $t$, the expression $t.\texttt{isEmpty}()$ checks whether $t$ is the empty tree.
+
+# The empty tree $\texttt{Nil}$ is represented by a single object that is shared by all trees.  Its subtrees are
+# $\texttt{Nil}$ again, its height and its size are $0$.  As $\texttt{Nil}$ is shared, it must never be changed.
+# Therefore, any attempt to assign to one of its member variables raises an `AttributeError`.
+# For the same reason, copying $\texttt{Nil}$ returns $\texttt{Nil}$ itself and $\texttt{Nil}$ is pickled by
+# reference, so that a copied or unpickled tree again ends in the shared object.
 
 # In[3]:
 
 
-def isEmpty(self):
-    return self.mKey is None
+class _NilNode(Node):
+    __slots__ = ()
 
-Set.isEmpty = isEmpty
-Set.__bool__ = isEmpty
+    def __setattr__(self, name, value):
+        raise AttributeError('Nil is immutable')
 
+    def __repr__(self):
+        return 'Nil'
 
-# In[ ]:
+    def __reduce__(self):
+        return 'Nil'
 
+    def __copy__(self):
+        return self
 
-def __bool__(self):
-    return self.mKey is not None
+    def __deepcopy__(self, memo):
+        return self
 
-Set.__bool__ = __bool__
+Nil = object.__new__(_NilNode)
+for _name, _value in [('mKey', None), ('mLeft', Nil), ('mRight', Nil), ('mHeight', 0), ('mSize', 0)]:
+    object.__setattr__(Nil, _name, _value)
+del _name, _value
 
 
-# Given an ordered binary tree $t$ and a key $k$, the expression $t.\texttt{member}(k)$ returns `True` if the key $k$ is stored in the tree $t$.
-# The method `member` is defined inductively as follows:
-#   - $\texttt{Nil}.\texttt{member}(k) = \Omega$,
-# 
-#     because the empty tree is interpreted as the empty map.
-#   - $\texttt{Node}(k, l, r).\texttt{member}(k) = v$,
-#       
-#     because the node $\texttt{Node}(k,l,r)$ stores the assignment $k \mapsto v$.
-#   - $k_1 < k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{member}(k_1) = l.\texttt{member}(k_1)$,
-# 
-#     because if $k_1$ is less than $k_2$, then any mapping for $k_1$ has to be stored in the left subtree  $l$.
-#   - $k_1 > k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{member}(k_1) = r.\texttt{member}(k_1)$,
-# 
-#     because if $k_1$ is greater than $k_2$, then any mapping for $k_1$ has to be stored in the right subtree  $r$.
+# The class `Set` is a handle for an AVL tree: The member variable `mRoot` is the root node of the tree.
+# The constructor `__init__` creates the empty set.
 
 # In[4]:
 
 
-def member(self, key):
-    if self.isEmpty():
-        return
-    elif self.mKey == key:
-        return True
-    elif key < self.mKey:
-        return self.mLeft.member(key)
-    else:
-        return self.mRight.member(key)
-    
-Set.member = member
-Set.__contains__ = member
+class Set:
+    def __init__(self):
+        self.mRoot = Nil
 
 
-# The method  $\texttt{insert}()$ is specified via recursive equations.
-#   - $\texttt{Nil}.\texttt{insert}(k) = \texttt{Node}(k, \texttt{Nil}, \texttt{Nil})$,
-#   - $\texttt{Node}(k, l, r).\texttt{insert}(k) = \texttt{Node}(k, l, r)$,
-#   - $k_1 < k_2 \rightarrow 
-#           \texttt{Node}(k_2, l, r).\texttt{insert}(k_1) =
-#           \texttt{Node}\bigl(k_2, l.\texttt{insert}(k_1), r\bigr).\texttt{restore}()$,
-#   - $k_1 > k_2 \rightarrow 
-#          \texttt{Node}(k_2, l, r).\texttt{insert}\bigl(k_1\bigr) = 
-#          \texttt{Node}\bigl(k_2, l, r.\texttt{insert}(k_1)\bigr).\texttt{restore}()$.
-# 
-# The function $\texttt{restore}$ is an auxiliary function that is defined below.  This function restores the balancing condition if it is violated after an insertion.
+# The function $\texttt{createNode}(k, l, r)$ creates an AVL-tree of that has the key $k$ stored at its root,
+# left subtree $l$ and right subtree $r$.
 
 # In[5]:
 
 
-def insert(self, key):
-    if self.isEmpty():
-        self.mKey    = key
-        self.mLeft   = Set()
-        self.mRight  = Set()
-        self.mHeight = 1
-    elif self.mKey == key:
-        pass
-    elif key < self.mKey:
-        self.mLeft.insert(key)
-        self._restore()
-    else:
-        self.mRight.insert(key)
-        self._restore()
-
-Set.insert = insert
+def createNode(key, left, right):
+    return Node(key, left, right, max(left.mHeight, right.mHeight) + 1, left.mSize + right.mSize + 1)
 
 
-# The method $\texttt{self}.\texttt{delete}(k)$ removes the key $k$ from the tree $\texttt{self}$.  It is defined as follows:
-# 
-#   - $\texttt{Nil}.\texttt{delete}(k) = \texttt{Nil}$,
-#   - $\texttt{Node}(k,\texttt{Nil},r).\texttt{delete}(k) = r$,
-#   - $\texttt{Node}(k,l,\texttt{Nil}).\texttt{delete}(k) = l$,
-#   - $l \not= \texttt{Nil} \,\wedge\, r \not= \texttt{Nil} \,\wedge\, 
-#        \langle r',k_{min} \rangle := r.\texttt{delMin}()  \;\rightarrow\;
-#       \texttt{Node}(k,l,r).\texttt{delete}(k) = \texttt{Node}(k_{min},l,r')$
-#   - $k_1 < k_2 \rightarrow \texttt{Node}(k_2,l,r).\texttt{delete}(k_1) = 
-#     \texttt{Node}\bigl(k_2,l.\texttt{delete}(k_1),r\bigr)$,
-#   - $k_1 > k_2 \rightarrow \texttt{Node}(k_2,l,r).\texttt{delete}(k_1) = 
-#      \texttt{Node}\bigl(k_2,l,r.\texttt{delete}(k_1)\bigr)$.
+# Given a set $S$, the expression $S.\texttt{isEmpty}()$ checks whether $S$ is empty.
 
 # In[6]:
 
 
-def delete(self, key):
-    if self.isEmpty():
-        return
-    if key == self.mKey:
-        if self.mLeft.isEmpty():
-            self._update(self.mRight)
-        elif self.mRight.isEmpty():
-            self._update(self.mLeft)
-        else:
-            self.mRight, self.mKey = self.mRight._delMin()
-    elif key < self.mKey:
-        self.mLeft.delete(key)
-    else:
-        self.mRight.delete(key)
-        
-Set.delete = delete
+def isEmpty(self):
+    return self.mRoot is Nil
 
+Set.isEmpty = isEmpty
 
-# The method $\texttt{self}.\texttt{delMin}()$ removes the smallest key from the given tree $\texttt{self}$
-# and returns a pair of the form
-# $$ (\texttt{self}, k_m) $$
-# where $\texttt{self}$ is the tree that remains after removing the smallest key, while $k_m$ is the smallest key that has been found.  
-# 
-# The function is defined as follows:
-# 
-#   - $\texttt{Node}(k, \texttt{Nil}, r).\texttt{delMin}() = \langle r, k \rangle$,
-#   - $l\not= \texttt{Nil} \wedge \langle l',k_{min}\rangle := l.\texttt{delMin}() 
-#        \;\rightarrow\;
-#      \texttt{Node}(k, l, r).\texttt{delMin}() = 
-#      \langle \texttt{Node}(k, l', r).\texttt{restore}(), k_{min} \rangle
-#     $
 
 # In[7]:
 
 
-def _delMin(self):
-    if self.mLeft.isEmpty():
-        return self.mRight, self.mKey
-    else:
-        ls, km = self.mLeft._delMin()
-        self.mLeft = ls
-        self._restore()
-        return self, km
-    
-Set._delMin = _delMin
+def __bool__(self):
+    return self.mRoot is not Nil
+
+Set.__bool__ = __bool__
 
 
-# Given two ordered binary trees $s$ and $t$, the expression $s.\texttt{update}(t)$ overwrites the attributes of $s$ with the corresponding attributes of $t$.
+# Given an ordered binary tree $t$ and a key $k$, the expression $t.\texttt{member}(k)$ returns `True` if the key $k$ is stored in the tree $t$.
+# The method `member` is defined inductively as follows:
+#   - $\texttt{Nil}.\texttt{member}(k) = \texttt{False}$,
+#   - $\texttt{Node}(k, l, r).\texttt{member}(k) = \texttt{True}$,
+#   - $k_1 < k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{member}(k_1) = l.\texttt{member}(k_1)$,
+#
+#     because if $k_1$ is less than $k_2$, then $k_1$ has to be stored in the left subtree  $l$.
+#   - $k_1 > k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{member}(k_1) = r.\texttt{member}(k_1)$,
+#
+#     because if $k_1$ is greater than $k_2$, then $k_1$ has to be stored in the right subtree  $r$.
+#
+# As every equation is tail recursive, the implementation replaces the recursion by a loop.
 
 # In[8]:
 
 
-def _update(self, t):
-    self.mKey    = t.mKey
-    self.mLeft   = t.mLeft
-    self.mRight  = t.mRight
-    self.mHeight = t.mHeight
-    
-Set._update = _update
-
-
-# The function $\texttt{restore}(\texttt{self})$ restores the balancing condition of the given binary tree
-# at the root node and recompute the variable $\texttt{mHeight}$.
-# 
-# The method $\texttt{restore}$ is specified via conditional equations.
-# 
-#   - $\texttt{Nil}.\texttt{restore}() = \texttt{Nil}$,
-# 
-#     because the empty tree already is an  AVL tree.
-#   - $|l.\texttt{height}() - r.\texttt{height}()| \leq 1 \rightarrow 
-#        \texttt{Node}(k,l,r).\texttt{restore}() = \texttt{Node}(k,l,r)$.
-# 
-#       If the balancing condition is satisfied, then nothing needs to be done. 
+def member(self, key):
+    node = self.mRoot
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            node = node.mLeft
+        elif k < key:
+            node = node.mRight
+        else:
+            return True
+    return False
+
+Set.member = member
+Set.__contains__ = member
+
+
+# The function $\texttt{_fix}(t)$ recomputes the height and the size of the node $t$ from its subtrees and
+# restores the balancing condition at $t$ in case it is violated.  It returns the root of the resulting tree.
+# The function is specified via conditional equations.
+#
+#   - $|l.\texttt{height}() - r.\texttt{height}()| \leq 1 \rightarrow
+#        \texttt{Node}(k,l,r).\texttt{fix}() = \texttt{Node}(k,l,r)$.
+#
+#       If the balancing condition is satisfied, then nothing needs to be done.
 #   - $\begin{array}[t]{cl}
-#               & l_1.\texttt{height}() = r_1.\texttt{height}() + 2    \\ 
+#               & l_1.\texttt{height}() = r_1.\texttt{height}() + 2    \\
 #        \wedge & l_1 = \texttt{Node}(k_2,l_2,r_2)                 \\
 #        \wedge & l_2.\texttt{height}() \geq r_2.\texttt{height}()     \\[0.2cm]
-#        \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{restore}() = 
+#        \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{fix}() =
 #                      \texttt{Node}\bigl(k_2,l_2,\texttt{Node}(k_1,r_2,r_1)\bigr)
 #        \end{array}
 #     $
 #   - $\begin{array}[t]{cl}
-#                & l_1.\texttt{height}() = r_1.\texttt{height}() + 2    \\ 
+#                & l_1.\texttt{height}() = r_1.\texttt{height}() + 2    \\
 #         \wedge & l_1 = \texttt{Node}(k_2,l_2,r_2)               \\
 #         \wedge & l_2.\texttt{height}() < r_2.\texttt{height}()     \\
 #         \wedge & r_2 = \texttt{Node}(k_3,l_3,r_3)               \\
-#         \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{restore}() = 
+#         \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{fix}() =
 #                       \texttt{Node}\bigl(k_3,\texttt{Node}(k_2,l_2,l_3),\texttt{Node}(k_1,r_3,r_1) \bigr)
 #         \end{array}
 #     $
 #   - $\begin{array}[t]{cl}
-#               & r_1.\texttt{height}() = l_1.\texttt{height}() + 2    \\ 
+#               & r_1.\texttt{height}() = l_1.\texttt{height}() + 2    \\
 #        \wedge & r_1 = \texttt{Node}(k_2,l_2,r_2)               \\
 #        \wedge & r_2.\texttt{height}() \geq l_2.\texttt{height}()     \\[0.2cm]
-#        \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{restore}() = 
+#        \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{fix}() =
 #                      \texttt{Node}\bigl(k_2,\texttt{Node}(k_1,l_1,l_2),r_2\bigr)
 #        \end{array}
 #     $
 #   - $\begin{array}[t]{cl}
-#                & r_1.\texttt{height}() = l_1.\texttt{height}() + 2    \\ 
+#                & r_1.\texttt{height}() = l_1.\texttt{height}() + 2    \\
 #         \wedge & r_1 = \texttt{Node}(k_2,l_2,r_2)               \\
 #         \wedge & r_2.\texttt{height}() < l_2.\texttt{height}()     \\
 #         \wedge & l_2 = \texttt{Node}(k_3,l_3,r_3)               \\
-#         \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{restore}() = 
+#         \rightarrow & \texttt{Node}(k_1,l_1,r_1).\texttt{fix}() =
 #                       \texttt{Node}\bigl(k_3,\texttt{Node}(k_1,l_1,l_3),\texttt{Node}(k_2,r_3,r_2) \bigr)
 #         \end{array}
 #     $
+#
+# The rotations do not create new nodes.  Instead, the nodes $k_1$, $k_2$, and $k_3$ are relinked.
 
 # In[9]:
 
 
-def _restore(self):
-    if abs(self.mLeft.mHeight - self.mRight.mHeight) <= 1:
-        self._restoreHeight()
-        return
-    if self.mLeft.mHeight > self.mRight.mHeight:
-        k1, l1, r1 = self.mKey, self.mLeft, self.mRight
-        k2, l2, r2 = l1.mKey, l1.mLeft, l1.mRight
+def _fix(node):
+    l, r   = node.mLeft, node.mRight
+    hl, hr = l.mHeight, r.mHeight
+    if hl > hr + 1:
+        l2, r2 = l.mLeft, l.mRight
         if l2.mHeight >= r2.mHeight:
-            self._setValues(k2, l2, createNode(k1, r2, r1))
-        else: 
-            k3, l3, r3 = r2.mKey, r2.mLeft, r2.mRight
-            self._setValues(k3, createNode(k2, l2, l3),
-                                createNode(k1, r3, r1))
-    elif self.mRight.mHeight > self.mLeft.mHeight:
-        k1, l1, r1 = self.mKey, self.mLeft, self.mRight
-        k2, l2, r2 = r1.mKey, r1.mLeft, r1.mRight
+            node.mLeft = r2
+            _update(node)
+            l.mRight = node
+            _update(l)
+            return l
+        l3, r3 = r2.mLeft, r2.mRight
+        l.mRight, node.mLeft = l3, r3
+        _update(l)
+        _update(node)
+        r2.mLeft, r2.mRight = l, node
+        _update(r2)
+        return r2
+    if hr > hl + 1:
+        l2, r2 = r.mLeft, r.mRight
         if r2.mHeight >= l2.mHeight:
-            self._setValues(k2, createNode(k1, l1, l2), r2)
-        else:
-            k3, l3, r3 = l2.mKey, l2.mLeft, l2.mRight
-            self._setValues(k3, createNode(k1, l1, l3),
-                                createNode(k2, r3, r2))
-    self._restoreHeight()
-    
-Set._restore = _restore
+            node.mRight = l2
+            _update(node)
+            r.mLeft = node
+            _update(r)
+            return r
+        l3, r3 = l2.mLeft, l2.mRight
+        node.mRight, r.mLeft = l3, r3
+        _update(node)
+        _update(r)
+        l2.mLeft, l2.mRight = node, r
+        _update(l2)
+        return l2
+    node.mHeight = (hl if hl > hr else hr) + 1
+    node.mSize   = l.mSize + r.mSize + 1
+    return node
 
 
-# The function $\texttt{self}.\texttt{_setValues}(k, l, r)$ overwrites the member variables of the node $\texttt{self}$ with the given values.
+# The function $\texttt{_update}(t)$ recomputes the height and the size of the node $t$ from the corresponding
+# values of its subtrees.
 
 # In[10]:
 
 
-def _setValues(self, k, l, r):
-    self.mKey   = k
-    self.mLeft  = l
-    self.mRight = r
-    
-Set._setValues = _setValues
+def _update(node):
+    l, r = node.mLeft, node.mRight
+    node.mHeight = max(l.mHeight, r.mHeight) + 1
+    node.mSize   = l.mSize + r.mSize + 1
+
 
+# The methods that change a tree first walk down from the root to the position where the tree needs to be changed.
+# The nodes visited on this way are recorded in the list `Path`, while the list `Dirs` records for every node in
+# `Path` whether the walk continued into the left subtree.  After the change, the function
+# $\texttt{_repair}(\texttt{Path}, \texttt{Dirs}, t, \delta)$ walks back up:
+# the new subtree $t$ is linked into its parent, then the parent is fixed, and so on up to the root.  Here $\delta$ is the change
+# of the number of keys.  The function returns the new root.
+#
+# Once a subtree keeps both its root and its height, the balancing conditions of the nodes above cannot change anymore.
+# Then only the sizes of the remaining nodes have to be adjusted.
 
 # In[11]:
 
 
-def _restoreHeight(self):
-    self.mHeight = max(self.mLeft.mHeight, self.mRight.mHeight) + 1
-    
-Set._restoreHeight = _restoreHeight
+def _repair(Path, Dirs, tree, delta):
+    i = len(Path) - 1
+    while i >= 0:
+        parent = Path[i]
+        if Dirs[i]:
+            parent.mLeft  = tree
+        else:
+            parent.mRight = tree
+        height = parent.mHeight
+        tree   = _fix(parent)
+        i     -= 1
+        if tree is parent and tree.mHeight == height:
+            while i >= 0:
+                Path[i].mSize += delta
+                i -= 1
+            return Path[0]
+    return tree
 
 
-# The function $\texttt{createNode}(k, l, r)$ creates an AVL-tree of that has the key $k$ stored at its root, 
-# left subtree $l$ and right subtree $r$.
+# The method  $\texttt{insert}()$ is specified via recursive equations.
+#   - $\texttt{Nil}.\texttt{insert}(k) = \texttt{Node}(k, \texttt{Nil}, \texttt{Nil})$,
+#   - $\texttt{Node}(k, l, r).\texttt{insert}(k) = \texttt{Node}(k, l, r)$,
+#   - $k_1 < k_2 \rightarrow
+#           \texttt{Node}(k_2, l, r).\texttt{insert}(k_1) =
+#           \texttt{Node}\bigl(k_2, l.\texttt{insert}(k_1), r\bigr).\texttt{fix}()$,
+#   - $k_1 > k_2 \rightarrow
+#          \texttt{Node}(k_2, l, r).\texttt{insert}\bigl(k_1\bigr) =
+#          \texttt{Node}\bigl(k_2, l, r.\texttt{insert}(k_1)\bigr).\texttt{fix}()$.
+#
+# The implementation walks down iteratively and then calls $\texttt{_repair}$ to walk back up.
 
 # In[12]:
 
 
-def createNode(key, left, right):
-    node         = Set()
-    node.mKey    = key
-    node.mLeft   = left
-    node.mRight  = right
-    node.mHeight = max(left.mHeight, right.mHeight) + 1
-    return node
+def insert(self, key):
+    node = self.mRoot
+    Path = []
+    Dirs = []
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            Path.append(node)
+            Dirs.append(True)
+            node = node.mLeft
+        elif k < key:
+            Path.append(node)
+            Dirs.append(False)
+            node = node.mRight
+        else:
+            return
+    self.mRoot = _repair(Path, Dirs, Node(key, Nil, Nil, 1, 1), 1)
+
+Set.insert = insert
+
+
+# The method $\texttt{self}.\texttt{delete}(k)$ removes the key $k$ from the tree $\texttt{self}$.  It is defined as follows:
+#
+#   - $\texttt{Nil}.\texttt{delete}(k) = \texttt{Nil}$,
+#   - $\texttt{Node}(k,\texttt{Nil},r).\texttt{delete}(k) = r$,
+#   - $\texttt{Node}(k,l,\texttt{Nil}).\texttt{delete}(k) = l$,
+#   - $l \not= \texttt{Nil} \,\wedge\, r \not= \texttt{Nil} \,\wedge\,
+#        \langle r',k_{min} \rangle := r.\texttt{delMin}()  \;\rightarrow\;
+#       \texttt{Node}(k,l,r).\texttt{delete}(k) = \texttt{Node}(k_{min},l,r').\texttt{fix}()$
+#   - $k_1 < k_2 \rightarrow \texttt{Node}(k_2,l,r).\texttt{delete}(k_1) =
+#     \texttt{Node}\bigl(k_2,l.\texttt{delete}(k_1),r\bigr).\texttt{fix}()$,
+#   - $k_1 > k_2 \rightarrow \texttt{Node}(k_2,l,r).\texttt{delete}(k_1) =
+#      \texttt{Node}\bigl(k_2,l,r.\texttt{delete}(k_1)\bigr).\texttt{fix}()$.
+#
+# Here, $r.\texttt{delMin}()$ removes the smallest key $k_{min}$ from $r$.  The implementation walks down to the
+# node containing $k$.  If this node has two subtrees, the walk continues down to the leftmost node of the right
+# subtree, whose key is then moved up.
+
+# In[13]:
+
+
+def delete(self, key):
+    node = self.mRoot
+    Path = []
+    Dirs = []
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            Path.append(node)
+            Dirs.append(True)
+            node = node.mLeft
+        elif k < key:
+            Path.append(node)
+            Dirs.append(False)
+            node = node.mRight
+        else:
+            break
+    else:
+        return
+    if node.mLeft is Nil:
+        tree = node.mRight
+    elif node.mRight is Nil:
+        tree = node.mLeft
+    else:
+        Path.append(node)
+        Dirs.append(False)
+        minimum = node.mRight
+        while minimum.mLeft is not Nil:
+            Path.append(minimum)
+            Dirs.append(True)
+            minimum = minimum.mLeft
+        node.mKey = minimum.mKey
+        tree      = minimum.mRight
+    self.mRoot = _repair(Path, Dirs, tree, -1)
+
+Set.delete = delete
 
 
 # The method $t.\texttt{pop}()$ take an AVL tree $t$ and removes and returns the smallest key that is present in $t$.  It is specified as follows:
 #   - $\texttt{Nil}.\texttt{pop}() = \Omega$
 #   - $\texttt{Node}(k,\texttt{Nil}, r).\texttt{pop}() = \langle k, r\rangle$
 #   - $l \not=\texttt{Nil} \wedge \langle k',l'\rangle := l.\texttt{pop}() \rightarrow
-#      \texttt{Node}(k, l, r).\texttt{pop}() = \langle k', \texttt{Node}(k, l', r)\rangle$
+#      \texttt{Node}(k, l, r).\texttt{pop}() = \langle k', \texttt{Node}(k, l', r).\texttt{fix}()\rangle$
 
-# In[13]:
+# In[14]:
 
 
 def pop(self):
-    if self.mKey == None:
-        raise KeyError
-    if self.mLeft.mKey == None:
-        key = self.mKey
-        self._update(self.mRight)
-        return key
-    return self.mLeft.pop()
+    node = self.mRoot
+    if node is Nil:
+        raise KeyError('pop from an empty set')
+    Path = []
+    while node.mLeft is not Nil:
+        Path.append(node)
+        node = node.mLeft
+    self.mRoot = _repair(Path, [True] * len(Path), node.mRight, -1)
+    return node.mKey
 
 Set.pop = pop
 
 
-# This method counts all nodes in the tree.
+# This method returns the number of keys in the tree.  As every node stores the size of the tree rooted at
+# this node in the member variable `mSize`, the complexity is $\mathcal{O}(1)$.
+
+# In[15]:
 
 
 def __len__(self):
-    if self.isEmpty():
-        return 0
-    return 1 + len(self.mLeft) + len(self.mRight)
-    
+    return self.mRoot.mSize
+
 Set.__len__ = __len__
 
 
-# The method $t.\texttt{first}()$ take an AVL tree $t$ and removes and returns the smallest key that is present in $t$.  It is specified as follows:
+# The method $t.\texttt{first}()$ take an AVL tree $t$ and returns the smallest key that is present in $t$.  It is specified as follows:
 #   - $\texttt{Nil}.\texttt{first}() = \Omega$
-#   - $\texttt{Node}(k,\texttt{Nil}, r).\texttt{first}() = k
-#   - $l \not=\texttt{Nil} \rightarrow := \texttt{Node}(k, l, r).\texttt{first}() = l.\texttt{first}()$
+#   - $\texttt{Node}(k,\texttt{Nil}, r).\texttt{first}() = k$
+#   - $l \not=\texttt{Nil} \rightarrow \texttt{Node}(k, l, r).\texttt{first}() = l.\texttt{first}()$
 
-# In[13]:
+# In[16]:
 
 def first(self):
-    if self.mKey == None:
-        raise KeyError
-    if self.mLeft.mKey == None:
-        return self.mKey
-    return self.mLeft.first()
+    node = self.mRoot
+    if node is Nil:
+        raise KeyError('first of an empty set')
+    while node.mLeft is not Nil:
+        node = node.mLeft
+    return node.mKey
 
 Set.first = first
 
@@ -365,33 +434,863 @@ Set.first = first
 #   - $\texttt{Nil}.\texttt{pop_last}() = \Omega$
 #   - $\texttt{Node}(k, l, \texttt{Nil}).\texttt{pop_last}() = \langle k, l\rangle$
 #   - $r \not=\texttt{Nil} \wedge \langle k',r'\rangle := r.\texttt{pop_last}() \rightarrow
-#      \texttt{Node}(k, l, r).\texttt{pop_last}() = \langle k', \texttt{Node}(k, l, r')\rangle$
+#      \texttt{Node}(k, l, r).\texttt{pop_last}() = \langle k', \texttt{Node}(k, l, r').\texttt{fix}()\rangle$
 
-# In[13]:
+# In[17]:
 
 def pop_last(self):
-    if self.mKey == None:
-        raise KeyError
-    if self.mRight.mKey == None:
-        key = self.mKey
-        self._update(self.mLeft)
-        return key
-    return self.mRight.pop_last()
+    node = self.mRoot
+    if node is Nil:
+        raise KeyError('pop_last from an empty set')
+    Path = []
+    while node.mRight is not Nil:
+        Path.append(node)
+        node = node.mRight
+    self.mRoot = _repair(Path, [False] * len(Path), node.mLeft, -1)
+    return node.mKey
 
 Set.pop_last = pop_last
 
 # The method $t.\texttt{last}()$ take an AVL tree $t$ and returns the largest key that is present in $t$.  It is specified as follows:
 #   - $\texttt{Nil}.\texttt{last}() = \Omega$
 #   - $\texttt{Node}(k, l, \texttt{Nil}).\texttt{last}() = k$
-#   - $r \not=\texttt{Nil} \rightarrow := \texttt{Node}(k, l, r).\texttt{pop_last}() = r.\texttt{last}()$
+#   - $r \not=\texttt{Nil} \rightarrow \texttt{Node}(k, l, r).\texttt{last}() = r.\texttt{last}()$
 
-# In[13]:
+# In[18]:
 
 def last(self):
-    if self.mKey == None:
-        raise KeyError
-    if self.mRight.mKey == None:
-        return self.mKey
-    return self.mRight.last()
+    node = self.mRoot
+    if node is Nil:
+        raise KeyError('last of an empty set')
+    while node.mRight is not Nil:
+        node = node.mRight
+    return node.mKey
 
 Set.last = last
+
+# The function $\texttt{from_sorted}(L)$ takes an iterable $L$ that yields its keys in ascending order and
+# returns a `Set` containing these keys.  Instead of inserting the keys one by one, the tree is built bottom up:
+# The middle key of $L$ becomes the root, the keys to its left are used to build the left subtree and the keys to
+# its right are used to build the right subtree.  The resulting tree is perfectly balanced and therefore an AVL tree.
+# As every key is visited exactly once, the complexity is $\mathcal{O}(n)$.  Duplicate keys are dropped.
+# If $L$ is not sorted, a `ValueError` is raised.
+
+# In[19]:
+
+def from_sorted(cls, L):
+    Keys = []
+    for key in L:
+        if Keys and not Keys[-1] < key:
+            if Keys[-1] == key:
+                continue
+            raise ValueError(f'from_sorted: keys are not sorted, {key} follows {Keys[-1]}')
+        Keys.append(key)
+    result       = cls()
+    result.mRoot = _buildBalanced(Keys, 0, len(Keys))
+    return result
+
+Set.from_sorted = classmethod(from_sorted)
+
+
+# The function $\texttt{_buildBalanced}(K, a, b)$ returns a perfectly balanced tree that contains the keys
+# $K[a], \cdots, K[b-1]$.  The list $K$ has to be sorted and free of duplicates.  As the tree is perfectly
+# balanced, its height is the number of binary digits of $b - a$.
+
+# In[20]:
+
+def _buildBalanced(Keys, a, b):
+    if a >= b:
+        return Nil
+    m = (a + b) // 2
+    return Node(Keys[m], _buildBalanced(Keys, a, m), _buildBalanced(Keys, m + 1, b), (b - a).bit_length(), b - a)
+
+
+# The function $\texttt{from_iterable}(L)$ returns a `Set` containing all keys of the iterable $L$.
+# The keys are sorted first, then the tree is built via $\texttt{from_sorted}$.  Hence the complexity is
+# $\mathcal{O}(n \cdot \log(n))$ for sorting, which is done in C, plus $\mathcal{O}(n)$ for building the tree.
+
+# In[21]:
+
+def from_iterable(cls, L):
+    return cls.from_sorted(sorted(L))
+
+Set.from_iterable = classmethod(from_iterable)
+
+
+# ## Order Statistics
+#
+# As every node stores the size of its subtree, we can answer questions about the position of a key
+# in time $\mathcal{O}(\log(n))$.
+#
+# The method $t.\texttt{rank}(k)$ returns the number of keys in $t$ that are less than $k$.  It is specified as follows:
+#   - $\texttt{Nil}.\texttt{rank}(k) = 0$,
+#   - $k_1 \leq k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{rank}(k_1) = l.\texttt{rank}(k_1)$,
+#   - $k_1 > k_2 \rightarrow \texttt{Node}(k_2, l, r).\texttt{rank}(k_1) = \texttt{len}(l) + 1 + r.\texttt{rank}(k_1)$.
+#
+# If $k$ is a member of $t$, then $t.\texttt{rank}(k)$ is the index of $k$ in the sorted sequence of keys.
+
+# In[22]:
+
+def rank(self, key):
+    node   = self.mRoot
+    result = 0
+    while node is not Nil:
+        if node.mKey < key:
+            result += node.mLeft.mSize + 1
+            node    = node.mRight
+        else:
+            node    = node.mLeft
+    return result
+
+Set.rank = rank
+
+
+# The method $t.\texttt{_rankRight}(k)$ returns the number of keys in $t$ that are less than or equal to $k$.
+
+# In[23]:
+
+def _rankRight(self, key):
+    node   = self.mRoot
+    result = 0
+    while node is not Nil:
+        if key < node.mKey:
+            node    = node.mLeft
+        else:
+            result += node.mLeft.mSize + 1
+            node    = node.mRight
+    return result
+
+Set._rankRight = _rankRight
+
+
+# The method $t.\texttt{select}(i)$ returns the key at index $i$ in the sorted sequence of keys, i.e. the
+# $i$-th smallest key where counting starts at $0$.  It is specified as follows:
+#   - $i < \texttt{len}(l) \rightarrow \texttt{Node}(k, l, r).\texttt{select}(i) = l.\texttt{select}(i)$,
+#   - $i = \texttt{len}(l) \rightarrow \texttt{Node}(k, l, r).\texttt{select}(i) = k$,
+#   - $i > \texttt{len}(l) \rightarrow \texttt{Node}(k, l, r).\texttt{select}(i) = r.\texttt{select}(i - \texttt{len}(l) - 1)$.
+#
+# Negative indices count from the end as for lists.  If $i$ is out of range, an `IndexError` is raised.
+
+# In[24]:
+
+def select(self, i):
+    node = self.mRoot
+    if i < 0:
+        i += node.mSize
+    if not 0 <= i < node.mSize:
+        raise IndexError('select: index out of range')
+    while True:
+        n = node.mLeft.mSize
+        if i < n:
+            node = node.mLeft
+        elif i == n:
+            return node.mKey
+        else:
+            i   -= n + 1
+            node = node.mRight
+
+Set.select = select
+
+
+# The method $t.\texttt{count_range}(a, b)$ returns the number of keys $k$ in $t$ such that $a \leq k \leq b$.
+
+# In[25]:
+
+def count_range(self, lo, hi):
+    if hi < lo:
+        return 0
+    return self._rankRight(hi) - self.rank(lo)
+
+Set.count_range = count_range
+
+
+# ## Split and Join
+#
+# The following functions work on trees rather than on sets.  They take the nodes of the trees they are
+# given and relink them.  Hence, the trees passed as arguments must not be used afterwards.
+#
+# The function $\texttt{_join}(l, n, r)$ takes two AVL trees $l$ and $r$ and a node $n$ such that all keys in
+# $l$ are less than the key $k$ of $n$ and all keys in $r$ are greater than $k$.  It returns an AVL tree that contains
+# the keys of $l$, the key $k$, and the keys of $r$.  If the heights of $l$ and $r$ differ by at most one, the result
+# is $\texttt{Node}(k, l, r)$.  Otherwise, if $l$ is higher than $r$, we walk down the right spine of $l$ until we
+# reach a subtree $t$ whose height is at most $r.\texttt{height}() + 1$.  This subtree is replaced by
+# $\texttt{Node}(k, t, r)$ and the nodes on the spine are fixed on the way back up.  The case that $r$ is higher than
+# $l$ is symmetric.  The complexity is $\mathcal{O}\bigl(|l.\texttt{height}() - r.\texttt{height}()| + 1\bigr)$.
+
+# In[26]:
+
+def _join(left, node, right):
+    hl, hr = left.mHeight, right.mHeight
+    if hl > hr + 1:
+        Path = []
+        tree = left
+        while tree.mHeight > hr + 1:
+            Path.append(tree)
+            tree = tree.mRight
+        node.mLeft, node.mRight = tree, right
+        _update(node)
+        return _repair(Path, [False] * len(Path), node, right.mSize + 1)
+    if hr > hl + 1:
+        Path = []
+        tree = right
+        while tree.mHeight > hl + 1:
+            Path.append(tree)
+            tree = tree.mLeft
+        node.mLeft, node.mRight = left, tree
+        _update(node)
+        return _repair(Path, [True] * len(Path), node, left.mSize + 1)
+    node.mLeft, node.mRight = left, right
+    _update(node)
+    return node
+
+
+# The function $\texttt{_join2}(l, r)$ joins two trees without a key in the middle.  To this end, the smallest
+# node of $r$ is removed from $r$ and used as the middle node.
+
+# In[27]:
+
+def _join2(left, right):
+    if left is Nil:
+        return right
+    if right is Nil:
+        return left
+    Path = []
+    node = right
+    while node.mLeft is not Nil:
+        Path.append(node)
+        node = node.mLeft
+    right = _repair(Path, [True] * len(Path), node.mRight, -1)
+    return _join(left, node, right)
+
+
+# The function $\texttt{_split}(t, k)$ splits the tree $t$ into a triple $(l, n, r)$.  Here $l$ is a tree containing
+# the keys of $t$ that are less than $k$, $r$ is a tree containing the keys of $t$ that are greater than $k$,
+# and $n$ is the node of $t$ storing $k$, or `None` if $k$ is not a member of $t$.  It is specified as follows:
+#   - $\texttt{Nil}.\texttt{split}(k) = \langle \texttt{Nil}, \texttt{None}, \texttt{Nil} \rangle$,
+#   - $\texttt{Node}(k, l, r).\texttt{split}(k) = \langle l, \texttt{Node}(k, l, r), r \rangle$,
+#   - $k_1 < k_2 \wedge \langle l', n, r' \rangle := l.\texttt{split}(k_1) \rightarrow
+#      \texttt{Node}(k_2, l, r).\texttt{split}(k_1) = \langle l', n, \texttt{join}(r', k_2, r) \rangle$,
+#   - $k_1 > k_2 \wedge \langle l', n, r' \rangle := r.\texttt{split}(k_1) \rightarrow
+#      \texttt{Node}(k_2, l, r).\texttt{split}(k_1) = \langle \texttt{join}(l, k_2, l'), n, r' \rangle$.
+#
+# The implementation walks down the search path and remembers the nodes whose keys are less than $k$ in the list
+# `Lower` and the nodes whose keys are greater than $k$ in the list `Upper`.  Then the pieces are joined
+# bottom up.  As the heights of the pieces increase along the path, the costs of the joins telescope and the
+# complexity is $\mathcal{O}(\log(n))$.
+
+# In[28]:
+
+def _split(tree, key):
+    Lower = []
+    Upper = []
+    found = None
+    while tree is not Nil:
+        k = tree.mKey
+        if key < k:
+            Upper.append(tree)
+            tree = tree.mLeft
+        elif k < key:
+            Lower.append(tree)
+            tree = tree.mRight
+        else:
+            found = tree
+            break
+    left  = found.mLeft  if found is not None else Nil
+    right = found.mRight if found is not None else Nil
+    for node in reversed(Lower):
+        left  = _join(node.mLeft, node, left)
+    for node in reversed(Upper):
+        right = _join(right, node, node.mRight)
+    return left, found, right
+
+
+# The function $\texttt{_copy}(t)$ returns a copy of the tree $t$ that does not share any node with $t$.
+
+# In[29]:
+
+def _copy(tree):
+    if tree is Nil:
+        return Nil
+    return Node(tree.mKey, _copy(tree.mLeft), _copy(tree.mRight), tree.mHeight, tree.mSize)
+
+
+# The method $S.\texttt{split}(k)$ splits the set $S$ into a triple $(L, b, R)$ where $L$ is the set of the keys of $S$
+# that are less than $k$, $R$ is the set of the keys that are greater than $k$, and $b$ is `True` if $k$ is a member of
+# $S$.  As the nodes of $S$ are reused for $L$ and $R$, the set $S$ is empty afterwards.  The complexity is
+# $\mathcal{O}(\log(n))$.
+#
+# The function $\texttt{join}(L, k, R)$ returns the union $L \cup \{k\} \cup R$.  It requires that all keys of $L$
+# are less than $k$ and that all keys of $R$ are greater than $k$, otherwise a `ValueError` is raised.  The sets $L$
+# and $R$ are empty afterwards.  The complexity is $\mathcal{O}(\log(n))$.
+
+# In[30]:
+
+def split(self, key):
+    left, found, right = _split(self.mRoot, key)
+    self.mRoot = Nil
+    L, R = type(self)(), type(self)()
+    L.mRoot, R.mRoot = left, right
+    return L, found is not None, R
+
+def join(cls, L, key, R):
+    if L and not L.last() < key or R and not key < R.first():
+        raise ValueError(f'join: {key} does not separate the keys of both sets')
+    result       = cls()
+    result.mRoot = _join(L.mRoot, Node(key, Nil, Nil, 1, 1), R.mRoot)
+    L.mRoot      = Nil
+    R.mRoot      = Nil
+    return result
+
+Set.split = split
+Set.join  = classmethod(join)
+
+
+# ## Set Operations
+#
+# The set operations are based on $\texttt{_split}$ and $\texttt{_join}$.  Each of the functions below takes a tree
+# $a$, whose nodes it may reuse, and a tree $b$, which it only reads.  The recursion follows the structure of $b$:
+# The tree $a$ is split at the key $k$ stored at the root of $b$, and the pieces of $a$ are combined with the
+# left and the right subtree of $b$ recursively.  If $a$ has $n$ keys and $b$ has $m$ keys, the complexity is
+# $\mathcal{O}\bigl(\min(m, n) \cdot \log(\max(m,n) / \min(m,n) + 1)\bigr)$.
+#
+# The function $\texttt{_union}(a, b)$ returns a tree containing the keys of both $a$ and $b$.  The nodes
+# for the keys of $b$ that are not in $a$ are new.
+#   - $\texttt{_union}(a, \texttt{Nil}) = a$,
+#   - $\texttt{_union}(\texttt{Nil}, b) = \texttt{_copy}(b)$,
+#   - $\langle l, n, r\rangle := a.\texttt{split}(k) \rightarrow
+#      \texttt{_union}\bigl(a, \texttt{Node}(k, l_b, r_b)\bigr) =
+#      \texttt{join}\bigl(\texttt{_union}(l, l_b), k, \texttt{_union}(r, r_b)\bigr)$.
+
+# In[31]:
+
+def _union(a, b):
+    if b is Nil:
+        return a
+    if a is Nil:
+        return _copy(b)
+    left, node, right = _split(a, b.mKey)
+    if node is None:
+        node = Node(b.mKey, Nil, Nil, 1, 1)
+    return _join(_union(left, b.mLeft), node, _union(right, b.mRight))
+
+
+# The function $\texttt{_intersection}(a, b)$ returns a tree containing the keys that are both in $a$ and in $b$.
+#   - $\texttt{_intersection}(a, \texttt{Nil}) = \texttt{Nil}$,
+#   - $\texttt{_intersection}(\texttt{Nil}, b) = \texttt{Nil}$,
+#   - $\langle l, \texttt{None}, r\rangle := a.\texttt{split}(k) \rightarrow
+#      \texttt{_intersection}\bigl(a, \texttt{Node}(k, l_b, r_b)\bigr) =
+#      \texttt{join2}\bigl(\texttt{_intersection}(l, l_b), \texttt{_intersection}(r, r_b)\bigr)$,
+#   - $\langle l, n, r\rangle := a.\texttt{split}(k) \wedge n \not= \texttt{None} \rightarrow
+#      \texttt{_intersection}\bigl(a, \texttt{Node}(k, l_b, r_b)\bigr) =
+#      \texttt{join}\bigl(\texttt{_intersection}(l, l_b), k, \texttt{_intersection}(r, r_b)\bigr)$.
+
+# In[32]:
+
+def _intersection(a, b):
+    if a is Nil or b is Nil:
+        return Nil
+    left, node, right = _split(a, b.mKey)
+    left  = _intersection(left,  b.mLeft)
+    right = _intersection(right, b.mRight)
+    if node is None:
+        return _join2(left, right)
+    return _join(left, node, right)
+
+
+# The function $\texttt{_difference}(a, b)$ returns a tree containing the keys of $a$ that are not in $b$.
+#   - $\texttt{_difference}(a, \texttt{Nil}) = a$,
+#   - $\texttt{_difference}(\texttt{Nil}, b) = \texttt{Nil}$,
+#   - $\langle l, n, r\rangle := a.\texttt{split}(k) \rightarrow
+#      \texttt{_difference}\bigl(a, \texttt{Node}(k, l_b, r_b)\bigr) =
+#      \texttt{join2}\bigl(\texttt{_difference}(l, l_b), \texttt{_difference}(r, r_b)\bigr)$.
+
+# In[33]:
+
+def _difference(a, b):
+    if a is Nil or b is Nil:
+        return a
+    left, _, right = _split(a, b.mKey)
+    return _join2(_difference(left, b.mLeft), _difference(right, b.mRight))
+
+
+# The method $S.\texttt{copy}()$ returns a copy of the set $S$.  The complexity is $\mathcal{O}(n)$.
+
+# In[34]:
+
+def copy(self):
+    result       = type(self)()
+    result.mRoot = _copy(self.mRoot)
+    return result
+
+Set.copy = copy
+
+
+# The methods $S.\texttt{update}(T)$, $S.\texttt{intersection_update}(T)$, and $S.\texttt{difference_update}(T)$
+# change the set $S$ into $S \cup T$, $S \cap T$, and $S \backslash T$, respectively.  The set $T$ is not changed.
+# If $T$ is not a `Set`, it can be any iterable.  These methods are also available as the operators
+# `|=`, `&=`, and `-=`.
+
+# In[35]:
+
+def _asSet(other):
+    if isinstance(other, Set):
+        return other
+    return Set.from_iterable(other)
+
+def update(self, other):
+    other = _asSet(other)
+    if other is not self:
+        self.mRoot = _union(self.mRoot, other.mRoot)
+    return self
+
+def intersection_update(self, other):
+    other = _asSet(other)
+    if other is not self:
+        self.mRoot = _intersection(self.mRoot, other.mRoot)
+    return self
+
+def difference_update(self, other):
+    other = _asSet(other)
+    if other is self:
+        self.mRoot = Nil
+    else:
+        self.mRoot = _difference(self.mRoot, other.mRoot)
+    return self
+
+Set.update              = update
+Set.intersection_update = intersection_update
+Set.difference_update   = difference_update
+
+
+# The methods $S.\texttt{union}(T)$, $S.\texttt{intersection}(T)$, and $S.\texttt{difference}(T)$ return a new set and
+# leave both $S$ and $T$ unchanged.  They copy one of the sets and then update the copy.  For the union, the bigger set
+# is copied and the smaller one is merged into the copy, for the intersection it is the other way round.  Therefore
+# the costs of the copy are $\mathcal{O}(n + m)$ for the union, $\mathcal{O}(\min(n, m))$ for the intersection, and
+# $\mathcal{O}(n)$ for the difference.  These methods are also available as the operators `|`, `&`, and `-`.
+
+# In[36]:
+
+def union(self, other):
+    other = _asSet(other)
+    big, small = (self, other) if len(self) >= len(other) else (other, self)
+    return big.copy().update(small)
+
+def intersection(self, other):
+    other = _asSet(other)
+    big, small = (self, other) if len(self) >= len(other) else (other, self)
+    return small.copy().intersection_update(big)
+
+def difference(self, other):
+    return self.copy().difference_update(_asSet(other))
+
+Set.union        = union
+Set.intersection = intersection
+Set.difference   = difference
+
+
+# The method $S.\texttt{issubset}(T)$ checks whether every key of $S$ is also a key of $T$.  As $S$ can only be
+# a subset of $T$ if $S$ has at most as many keys as $T$, the sizes are compared first.  Then every key of $S$ is
+# looked up in $T$.  The complexity is $\mathcal{O}\bigl(n \cdot \log(m)\bigr)$.
+
+# In[37]:
+
+def issubset(self, other):
+    other = _asSet(other)
+    if len(self) > len(other):
+        return False
+    return all(other.member(key) for key in _inorder(self.mRoot))
+
+Set.issubset = issubset
+
+
+# The function $\texttt{_inorder}(t)$ is a generator that yields the keys of the tree $t$ in ascending order.
+# Instead of recursion, it uses a stack that holds the nodes whose keys still have to be yielded.  This stack
+# never holds more than $t.\texttt{height}()$ nodes.
+
+# In[38]:
+
+def _inorder(tree):
+    Stack = []
+    while True:
+        while tree is not Nil:
+            Stack.append(tree)
+            tree = tree.mLeft
+        if not Stack:
+            return
+        tree = Stack.pop()
+        yield tree.mKey
+        tree = tree.mRight
+
+
+# Finally, the set operations are made available as operators.  The operators only accept sets.
+
+# In[39]:
+
+def _binary(method):
+    def operator(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return method(self, other)
+    return operator
+
+Set.__or__   = _binary(union)
+Set.__and__  = _binary(intersection)
+Set.__sub__  = _binary(difference)
+Set.__ior__  = _binary(update)
+Set.__iand__ = _binary(intersection_update)
+Set.__isub__ = _binary(difference_update)
+Set.__le__   = _binary(issubset)
+
+
+# ## Iteration and Range Queries
+#
+# Iterating over a set yields its keys in ascending order, while $\texttt{reversed}(S)$ yields them in
+# descending order.  Both use a stack of at most $\mathcal{O}(\log(n))$ nodes and do not copy the tree.
+# The set must not be changed while an iteration is in progress.
+
+# In[40]:
+
+def __iter__(self):
+    return _inorder(self.mRoot)
+
+def _reverseorder(tree):
+    Stack = []
+    while True:
+        while tree is not Nil:
+            Stack.append(tree)
+            tree = tree.mRight
+        if not Stack:
+            return
+        tree = Stack.pop()
+        yield tree.mKey
+        tree = tree.mLeft
+
+def __reversed__(self):
+    return _reverseorder(self.mRoot)
+
+Set.__iter__     = __iter__
+Set.__reversed__ = __reversed__
+
+
+# The method $S.\texttt{irange}(a, b)$ returns a generator that yields the keys $k$ of $S$ such that $a \leq k \leq b$
+# in ascending order.  If $a$ is `None`, there is no lower bound and if $b$ is `None`, there is no upper bound.
+# The parameter `inclusive` is a pair of Booleans that specifies whether $a$ and $b$ are themselves part of the range.
+# The generator first walks down to the smallest key in the range, ignoring all subtrees that are below $a$.
+# It stops as soon as it meets a key that is above $b$.  Therefore, the complexity of enumerating $r$ keys
+# is $\mathcal{O}(\log(n) + r)$.
+
+# In[41]:
+
+def irange(self, lo=None, hi=None, inclusive=(True, True)):
+    return _irange(self.mRoot, lo, hi, inclusive[0], inclusive[1])
+
+def _irange(tree, lo, hi, incLo, incHi):
+    Stack = []
+    while tree is not Nil:
+        k = tree.mKey
+        if lo is not None and (k < lo or not incLo and not lo < k):
+            tree = tree.mRight
+        else:
+            Stack.append(tree)
+            tree = tree.mLeft
+    while Stack:
+        tree = Stack.pop()
+        k    = tree.mKey
+        if hi is not None and (hi < k or not incHi and not k < hi):
+            return
+        yield k
+        tree = tree.mRight
+        while tree is not Nil:
+            Stack.append(tree)
+            tree = tree.mLeft
+
+Set.irange = irange
+
+
+# Given a key $k$, that need not be a member of $S$,
+#   - $S.\texttt{floor}(k)$ returns the biggest key of $S$ that is less than or equal to $k$,
+#   - $S.\texttt{ceiling}(k)$ returns the smallest key of $S$ that is greater than or equal to $k$,
+#   - $S.\texttt{predecessor}(k)$ returns the biggest key of $S$ that is less than $k$, and
+#   - $S.\texttt{successor}(k)$ returns the smallest key of $S$ that is greater than $k$.
+#
+# If there is no such key, these methods return `None`.  All of them walk down a single path and therefore have
+# complexity $\mathcal{O}(\log(n))$.
+
+# In[42]:
+
+def floor(self, key):
+    node, result = self.mRoot, None
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            node = node.mLeft
+        elif k < key:
+            result, node = k, node.mRight
+        else:
+            return k
+    return result
+
+def ceiling(self, key):
+    node, result = self.mRoot, None
+    while node is not Nil:
+        k = node.mKey
+        if k < key:
+            node = node.mRight
+        elif key < k:
+            result, node = k, node.mLeft
+        else:
+            return k
+    return result
+
+def predecessor(self, key):
+    node, result = self.mRoot, None
+    while node is not Nil:
+        k = node.mKey
+        if k < key:
+            result, node = k, node.mRight
+        else:
+            node = node.mLeft
+    return result
+
+def successor(self, key):
+    node, result = self.mRoot, None
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            result, node = k, node.mLeft
+        else:
+            node = node.mRight
+    return result
+
+Set.floor       = floor
+Set.ceiling     = ceiling
+Set.predecessor = predecessor
+Set.successor   = successor
+
+
+# ## Persistent Sets
+#
+# The methods of the class `Set` change the nodes of the tree in place.  Hence, if we need the set as it was before an
+# update, we have to copy it first, which costs $\mathcal{O}(n)$.  The class `PersistentSet` avoids this: Its nodes
+# are never changed after they have been created.  Instead, $S.\texttt{insert}(k)$ and $S.\texttt{delete}(k)$ return
+# a new set and leave $S$ unchanged.  Only the nodes on the path from the root to the position of $k$ are copied, all
+# other subtrees are shared between $S$ and the new set.  Therefore, an update allocates $\mathcal{O}(\log(n))$ nodes
+# and keeping an old version, i.e. taking a snapshot, costs $\mathcal{O}(1)$.
+#
+# A `PersistentSet` supports the same queries as a `Set`.  The functions implementing these queries only read the
+# tree and are therefore shared with the class `Set`.  `PersistentSet.from_sorted(S)` converts a `Set` $S$ into a
+# `PersistentSet` in time $\mathcal{O}(n)$.
+
+# In[43]:
+
+class PersistentSet:
+    def __init__(self):
+        self.mRoot = Nil
+
+for _method in [isEmpty, __bool__, member, __len__, first, last, rank, _rankRight, select, count_range,
+                __iter__, __reversed__, irange, floor, ceiling, predecessor, successor]:
+    setattr(PersistentSet, _method.__name__, _method)
+del _method
+PersistentSet.__contains__  = member
+PersistentSet.from_sorted   = classmethod(from_sorted)
+PersistentSet.from_iterable = classmethod(from_iterable)
+
+
+# The function $\texttt{_balance}(k, l, r)$ returns a balanced tree with the key $k$, the left subtree $l$, and the
+# right subtree $r$.  It implements the same equations as the function $\texttt{_fix}$, but instead of relinking
+# existing nodes it creates new ones.  It is required that the heights of $l$ and $r$ differ by at most two.
+
+# In[44]:
+
+def _balance(key, left, right):
+    hl, hr = left.mHeight, right.mHeight
+    if hl > hr + 1:
+        l2, r2 = left.mLeft, left.mRight
+        if l2.mHeight >= r2.mHeight:
+            return createNode(left.mKey, l2, createNode(key, r2, right))
+        return createNode(r2.mKey, createNode(left.mKey, l2, r2.mLeft), createNode(key, r2.mRight, right))
+    if hr > hl + 1:
+        l2, r2 = right.mLeft, right.mRight
+        if r2.mHeight >= l2.mHeight:
+            return createNode(right.mKey, createNode(key, left, l2), r2)
+        return createNode(l2.mKey, createNode(key, left, l2.mLeft), createNode(right.mKey, l2.mRight, r2))
+    return Node(key, left, right, (hl if hl > hr else hr) + 1, left.mSize + right.mSize + 1)
+
+
+# The function $\texttt{_copyPath}(\texttt{Path}, \texttt{Dirs}, t)$ is the persistent counterpart of
+# $\texttt{_repair}$:  For every node on the path, a new node is created whose subtree in direction of the path is
+# the tree built so far, while the other subtree is shared.
+
+# In[45]:
+
+def _copyPath(Path, Dirs, tree):
+    for i in range(len(Path) - 1, -1, -1):
+        node = Path[i]
+        if Dirs[i]:
+            tree = _balance(node.mKey, tree, node.mRight)
+        else:
+            tree = _balance(node.mKey, node.mLeft, tree)
+    return tree
+
+
+# The methods $S.\texttt{insert}(k)$ and $S.\texttt{delete}(k)$ walk down the tree in the same way as the
+# corresponding methods of the class `Set`.  If nothing changes, $S$ itself is returned.
+
+# In[46]:
+
+def _persistentInsert(self, key):
+    node = self.mRoot
+    Path = []
+    Dirs = []
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            Path.append(node)
+            Dirs.append(True)
+            node = node.mLeft
+        elif k < key:
+            Path.append(node)
+            Dirs.append(False)
+            node = node.mRight
+        else:
+            return self
+    result       = PersistentSet()
+    result.mRoot = _copyPath(Path, Dirs, Node(key, Nil, Nil, 1, 1))
+    return result
+
+def _persistentDelete(self, key):
+    node = self.mRoot
+    Path = []
+    Dirs = []
+    while node is not Nil:
+        k = node.mKey
+        if key < k:
+            Path.append(node)
+            Dirs.append(True)
+            node = node.mLeft
+        elif k < key:
+            Path.append(node)
+            Dirs.append(False)
+            node = node.mRight
+        else:
+            break
+    else:
+        return self
+    if node.mLeft is Nil:
+        tree = node.mRight
+    elif node.mRight is Nil:
+        tree = node.mLeft
+    else:
+        Below   = []
+        minimum = node.mRight
+        while minimum.mLeft is not Nil:
+            Below.append(minimum)
+            minimum = minimum.mLeft
+        right = _copyPath(Below, [True] * len(Below), minimum.mRight)
+        tree  = _balance(minimum.mKey, node.mLeft, right)
+    result       = PersistentSet()
+    result.mRoot = _copyPath(Path, Dirs, tree)
+    return result
+
+PersistentSet.insert = _persistentInsert
+PersistentSet.delete = _persistentDelete
+
+
+# ## Batch Operations
+#
+# The following methods take an iterable $L$ of keys and sort these keys once.  Then the sorted keys are pushed down
+# the tree together:  At a node with key $k$, the keys that are less than $k$ are passed on to the left subtree and
+# the keys that are greater than $k$ are passed on to the right subtree.  The keys are split with a binary search.
+# Subtrees that do not receive any keys are not visited.  If the set has $n$ keys and $L$ has $m$ keys, at most
+# $\mathcal{O}\bigl(m \cdot \log(n / m + 1)\bigr)$ nodes are visited.
+#
+# The method $S.\texttt{contains_many}(L)$ takes a sequence of keys $L$ and returns a list $R$ of Booleans such that
+# $R[i]$ is `True` if $L[i]$ is a member of $S$.  Once a single key is left for a subtree, a binary search is no
+# longer needed and the key is looked up with a simple loop as in $\texttt{member}$.
+
+# In[47]:
+
+def contains_many(self, L):
+    L      = list(L)
+    Order  = sorted(range(len(L)), key=L.__getitem__)
+    Keys   = [L[i] for i in Order]
+    Result = [False] * len(L)
+    _containsSorted(self.mRoot, Keys, 0, len(Keys), Order, Result)
+    return Result
+
+def _containsSorted(tree, Keys, a, b, Order, Result):
+    while tree is not Nil and a < b:
+        if b - a == 1:
+            key = Keys[a]
+            while tree is not Nil:
+                k = tree.mKey
+                if key < k:
+                    tree = tree.mLeft
+                elif k < key:
+                    tree = tree.mRight
+                else:
+                    Result[Order[a]] = True
+                    return
+            return
+        key = tree.mKey
+        i   = bisect_left (Keys, key, a, b)
+        j   = bisect_right(Keys, key, i, b)
+        for p in range(i, j):
+            Result[Order[p]] = True
+        _containsSorted(tree.mLeft, Keys, a, i, Order, Result)
+        tree, a = tree.mRight, j
+
+Set.contains_many = contains_many
+
+
+# The method $S.\texttt{insert_many}(L)$ inserts all keys of $L$ into $S$ and returns the number of keys that have
+# been new.  When the keys arrive at an empty subtree, a balanced tree is built from them with
+# $\texttt{_buildBalanced}$.  On the way back up, every visited node is combined with its new subtrees using
+# $\texttt{_join}$, which restores the balancing condition no matter how much the subtrees have grown.
+# The method $S.\texttt{delete_many}(L)$ removes all keys of $L$ from $S$ and returns the number of keys that have
+# been removed.  Here, a node whose key is removed is replaced by $\texttt{_join2}$ of its new subtrees.
+
+# In[48]:
+
+def insert_many(self, L):
+    n          = len(self)
+    Keys       = _sortedUnique(L)
+    self.mRoot = _insertSorted(self.mRoot, Keys, 0, len(Keys))
+    return len(self) - n
+
+def _insertSorted(tree, Keys, a, b):
+    if a >= b:
+        return tree
+    if tree is Nil:
+        return _buildBalanced(Keys, a, b)
+    key = tree.mKey
+    i   = bisect_left(Keys, key, a, b)
+    j   = i + 1 if i < b and not key < Keys[i] else i
+    left  = _insertSorted(tree.mLeft,  Keys, a, i)
+    right = _insertSorted(tree.mRight, Keys, j, b)
+    return _join(left, tree, right)
+
+def delete_many(self, L):
+    n          = len(self)
+    Keys       = _sortedUnique(L)
+    self.mRoot = _deleteSorted(self.mRoot, Keys, 0, len(Keys))
+    return n - len(self)
+
+def _deleteSorted(tree, Keys, a, b):
+    if a >= b or tree is Nil:
+        return tree
+    key   = tree.mKey
+    i     = bisect_left(Keys, key, a, b)
+    found = i < b and not key < Keys[i]
+    left  = _deleteSorted(tree.mLeft,  Keys, a, i)
+    right = _deleteSorted(tree.mRight, Keys, i + 1 if found else i, b)
+    if found:
+        return _join2(left, right)
+    return _join(left, tree, right)
+
+def _sortedUnique(L):
+    Keys = sorted(L)
+    return [k for i, k in enumerate(Keys) if i == 0 or Keys[i-1] < k]
+
+Set.insert_many = insert_many
+Set.delete_many = delete_many
@@ -0,0 +1,33 @@
+"""
+directory_cache
+~~~~~~~~~~~~~~~
+Write caches that consist of a directory of files, e.g. the .npy files
+of mnist_loader and of csv_columns in Chapter-05.  A cache directory is
+first written under a temporary name and then renamed, so other processes
+never see a partially written cache.
+"""
+
+import os
+import shutil
+
+def replace_directory(cache, write):
+    """
+    Call write with a temporary directory that then replaces the directory
+    cache.  The directories cache.tmpPID and cache.oldPID only exist while
+    this function runs: if write raises an exception, the temporary
+    directory is removed before the exception is passed on.
+    """
+    tmp = f'{cache}.tmp{os.getpid()}'
+    os.makedirs(tmp, exist_ok=True)
+    try:
+        write(tmp)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if os.path.exists(cache):
+        old = f'{cache}.old{os.getpid()}'
+        os.rename(cache, old)
+        os.rename(tmp, cache)
+        shutil.rmtree(old)
+    else:
+        os.rename(tmp, cache)
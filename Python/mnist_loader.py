@@ -6,16 +6,214 @@ A library to load the MNIST image data.  For details of the data
 structures that are returned, see the doc strings for ``load_data``
 and ``load_data_wrapper``.  In practice, ``load_data_wrapper`` is the
 function usually called by our neural network code.
+
+Unpickling the compressed data set takes several seconds.  Therefore,
+``load_arrays`` converts it once into uncompressed ``.npy`` files that
+are memory-mapped by later calls.  The pixels are stored as bytes, i.e.
+as numpy.uint8, which needs a quarter of the memory of numpy.float32.
+A pixel p is normalised to p * PIXEL_SCALE when it is used.  Data sets
+in the IDX format of the original MNIST files are converted in the same
+way by ``load_idx``, which reads the IDX files in chunks, so they never
+have to fit into memory.
 """
 
 #### Libraries
 # Standard library
+import os
 import pickle
 import gzip
+import struct
 
 # Third-party libraries
 import numpy as np
 
+from directory_cache import replace_directory
+
+SPLITS = ['training', 'validation', 'test']
+
+# The pickled data set stores every pixel as its byte value divided by 256.
+PIXEL_SCALE = 1 / 256
+
+# The version of the cache.  Caches with another version are rebuilt.
+CACHE_VERSION = '2'
+
+def load_arrays(fileName='mnist.pkl.gz', cache=None, mmap=True, raw=False):
+    """
+    Return a tuple 
+        ((X_train, y_train), (X_validation, y_validation), (X_test, y_test))
+    where every X is a contiguous numpy.ndarray of shape (N, 784) with one
+    image per row and every y is a numpy.ndarray of shape (N,) that contains
+    the digits.  If raw is True, X contains the pixels as bytes, otherwise
+    it contains the normalised pixels as numpy.float32.
+
+    The first call converts the data set stored in fileName into .npy files
+    in the directory cache, which by default is fileName + '.cache'.  Later
+    calls load these files, so nothing has to be unzipped or unpickled.  If
+    fileName is newer than the cache, the cache is rebuilt.  If mmap is
+    True, the arrays are memory-mapped read-only, so only the pages that 
+    are used are read and all processes share one copy of the data.  The 
+    normalised images are computed from the bytes and are never mapped.
+    """
+    if cache is None:
+        cache = fileName + '.cache'
+    if _stale(cache, [fileName]):
+        _build_cache(fileName, cache)
+    mode   = 'r' if mmap else None
+    Splits = [(np.load(os.path.join(cache, f'{split}_images.npy'), mmap_mode=mode),
+               np.load(os.path.join(cache, f'{split}_labels.npy'), mmap_mode=mode))
+              for split in SPLITS]
+    if not raw:
+        Splits = [(normalize(X), y) for X, y in Splits]
+    return tuple(Splits)
+
+def normalize(X, dtype=np.float32):
+    "Return the bytes X as normalised pixels of type dtype."
+    return np.multiply(X, dtype(PIXEL_SCALE), dtype=dtype)
+
+def _stale(cache, Sources):
+    """
+    Check whether the cache has to be built.  This is the case if it has
+    not been completed, has another version or is older than one of the
+    files in Sources.  A completed cache contains the file complete, which
+    contains the version.
+    """
+    stamp = os.path.join(cache, 'complete')
+    if not os.path.exists(stamp):
+        return True
+    with open(stamp) as f:
+        if f.read() != CACHE_VERSION:
+            return True
+    return any(os.path.getmtime(stamp) < os.path.getmtime(source) for source in Sources)
+
+def _build_cache(fileName, cache):
+    """
+    Unpickle fileName and store its images as bytes and its labels as .npy
+    files in the directory cache.
+    """
+    with gzip.open(fileName, 'rb') as f:
+        data = pickle.load(f, encoding="latin1")
+    def write(tmp):
+        for split, (X, y) in zip(SPLITS, data):
+            B = np.rint(np.multiply(X, 1 / PIXEL_SCALE)).clip(0, 255).astype(np.uint8)
+            np.save(os.path.join(tmp, f'{split}_images.npy'), B)
+            np.save(os.path.join(tmp, f'{split}_labels.npy'), np.ascontiguousarray(y, dtype=np.int64))
+    _write_cache(cache, write)
+
+def _write_cache(cache, write):
+    """
+    Call write with a temporary directory that then replaces the directory
+    cache.  After write has finished, the file complete is created.
+    """
+    def write_complete(tmp):
+        write(tmp)
+        with open(os.path.join(tmp, 'complete'), 'w') as f:
+            f.write(CACHE_VERSION)
+    replace_directory(cache, write_complete)
+
+# The types of the entries of an IDX file, indexed by the third byte of its
+# magic number.  All numbers in IDX files are big endian.
+IDX_TYPES = { 0x08: '>u1', 0x09: '>i1', 0x0B: '>i2', 0x0C: '>i4', 0x0D: '>f4', 0x0E: '>f8' }
+
+def _open(fileName):
+    "Open fileName for reading bytes, unzipping it if its suffix is .gz."
+    if fileName.endswith('.gz'):
+        return gzip.open(fileName, 'rb')
+    return open(fileName, 'rb')
+
+def _idx_header(f):
+    """
+    Read the header of the IDX file f and return the type of its entries
+    and its dimensions.
+    """
+    zero, code, n = struct.unpack('>HBB', f.read(4))
+    if zero != 0 or code not in IDX_TYPES:
+        raise ValueError('not an IDX file')
+    return np.dtype(IDX_TYPES[code]), struct.unpack('>' + 'I' * n, f.read(4 * n))
+
+def idx_shape(fileName):
+    "Return the dimensions of the IDX file fileName."
+    with _open(fileName) as f:
+        return _idx_header(f)[1]
+
+def read_idx(fileName, chunk_size=10000):
+    """
+    Generate the items of the IDX file fileName in chunks of chunk_size items.
+    For a file of dimensions (N, d1, ..., dk), every chunk is a numpy.ndarray
+    of shape (c, d1 * ... * dk) where c <= chunk_size.  A file with one 
+    dimension yields chunks of shape (c,).  Only one chunk is in memory at
+    a time.
+    """
+    with _open(fileName) as f:
+        dtype, dims = _idx_header(f)
+        size  = int(np.prod(dims[1:], dtype=np.int64))
+        shape = (size,) if len(dims) > 1 else ()
+        for k in range(0, dims[0], chunk_size):
+            c      = min(chunk_size, dims[0] - k)
+            buffer = f.read(c * size * dtype.itemsize)
+            if len(buffer) < c * size * dtype.itemsize:
+                raise ValueError(f'{fileName} is truncated')
+            yield np.frombuffer(buffer, dtype).reshape((c,) + shape)
+
+def load_idx(images, labels, cache=None, mmap=True, chunk_size=10000):
+    """
+    Return a pair (X, y) where X contains the images of the IDX file images
+    as bytes, with one image per row, and y contains the labels of the IDX
+    file labels.  The first call streams both files in chunks of chunk_size
+    images into .npy files in the directory cache, which by default is 
+    images + '.cache', so the data set never has to fit into memory.  Later
+    calls, and the first one, too, memory-map these files if mmap is True.
+    """
+    if cache is None:
+        cache = images + '.cache'
+    if _stale(cache, [images, labels]):
+        def write(tmp):
+            for source, name, dtype in [(images, 'images', np.uint8), (labels, 'labels', np.int64)]:
+                dims  = idx_shape(source)
+                shape = (dims[0], int(np.prod(dims[1:], dtype=np.int64))) if len(dims) > 1 else dims
+                A = np.lib.format.open_memmap(os.path.join(tmp, name + '.npy'), mode='w+', 
+                                              dtype=dtype, shape=shape)
+                k = 0
+                for chunk in read_idx(source, chunk_size):
+                    A[k : k+len(chunk)] = chunk
+                    k += len(chunk)
+                A.flush()
+                del A
+        _write_cache(cache, write)
+    mode = 'r' if mmap else None
+    return (np.load(os.path.join(cache, 'images.npy'), mmap_mode=mode),
+            np.load(os.path.join(cache, 'labels.npy'), mmap_mode=mode))
+
+def load_data_wrapper(fileName='mnist.pkl.gz'):
+    """
+    Return a tuple (training_data, validation_data, test_data), where every
+    component is a pair (X, y) as returned by load_arrays with raw = True:
+    X contains the images as bytes and is memory-mapped, y contains the
+    digits.  These pairs are meant to be wrapped into a TrainingSet of the
+    module pipeline in Chapter-07 with scale = PIXEL_SCALE, which normalises
+    the pixels and converts the digits into unit vectors one mini-batch at
+    a time.  Use load_data to get lists of pairs of vectors instead.
+    """
+    return load_arrays(fileName, raw=True)
+
+def as_pairs(X, y, vectorize=False):
+    """
+    Convert the images X and the labels y into a list of pairs (x, y) as
+    returned by load_data.  Every x is a view of a row of X with shape
+    (784, 1).  If vectorize is True, y is converted by vectorized_result.
+    """
+    if vectorize:
+        return [(x.reshape(784, 1), vectorized_result(j)) for x, j in zip(X, y)]
+    return [(x.reshape(784, 1), int(j)) for x, j in zip(X, y)]
+
+def one_hot(y):
+    """
+    Return a matrix of shape (N, 10) whose i-th row is the unit vector for
+    the digit y[i].  This is the matrix form of vectorized_result.
+    """
+    Y = np.zeros((len(y), 10), dtype=np.float32)
+    Y[np.arange(len(y)), y] = 1.0
+    return Y
+
 def load_data():
     """
     Return a tuple 
@@ -35,20 +233,12 @@ def load_data():
     Note that this means we're using slightly different formats for
     the training data and the validation / test data.  These formats
     turn out to be the most convenient for use in our neural network
-    code.
-    """
-    with gzip.open('mnist.pkl.gz', 'rb') as f:
-        tr_d, va_d, te_d = pickle.load(f, encoding="latin1")
-    training_inputs   = [np.reshape(x, (784, 1)) for x in tr_d[0]]
-    training_results  = [vectorized_result(y) for y in tr_d[1]]
-    training_data     = zip(training_inputs, training_results)
-    validation_inputs = [np.reshape(x, (784, 1)) for x in va_d[0]]
-    validation_data   = zip(validation_inputs, va_d[1])
-    test_inputs       = [np.reshape(x, (784, 1)) for x in te_d[0]]
-    test_data         = zip(test_inputs, te_d[1])
-    training_data     = list(training_data)
-    validation_data   = list(validation_data)
-    test_data         = list(test_data)
+    code.  The images are views of the arrays returned by load_arrays.
+    """
+    (tr_X, tr_y), (va_X, va_y), (te_X, te_y) = load_arrays(mmap=False)
+    training_data   = as_pairs(tr_X, tr_y, vectorize=True)
+    validation_data = as_pairs(va_X, va_y)
+    test_data       = as_pairs(te_X, te_y)
     return (training_data, validation_data, test_data)
 
 def vectorized_result(j):
@@ -0,0 +1,448 @@
+"""
+set_benchmark
+~~~~~~~~~~~~~
+A reproducible benchmark suite for the module Set.  It measures the
+operations insert, member, delete, pop, first, last and len of the class
+Set for several key streams and sizes and compares them with three
+baselines: the built-in set, a binary heap using heapq, and a sorted list
+using bisect.  For every run, it reports the number of operations per
+second, the peak memory per key and, for Set, the height of the tree.
+Furthermore, it compares PersistentSet with copying a Set and the
+frontiers of the module Frontier on A* searches.  Run it as
+
+    python set_benchmark.py [--sizes 1000 10000 100000] [--seed 42] [--repeat 5]
+                            [--json results.json] [--compare old.json]
+
+Every timing is repeated --repeat times and the best result is kept, as the
+best of several runs is far less affected by noise than a single run.
+With --json, all results are written as a list of records to a JSON file.
+With --compare, the results are compared with those of an earlier run and
+every metric that has become worse by more than 10% is reported; the
+threshold can be changed with --tolerance.  For the operations per second,
+higher is better, for all other metrics, i.e. seconds, bytes and heights,
+lower is better.  If there are regressions, the exit status is 1.
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+from Set      import Set, PersistentSet
+from Frontier import SetFrontier, HeapFrontier
+
+OPERATIONS = ['insert', 'member', 'delete', 'pop', 'first', 'last', 'len']
+
+class AVLSet(object):
+    "Adapter for the class Set."
+    name = 'Set'
+    def __init__(self):
+        self.mSet = Set()
+    def insert(self, key):
+        self.mSet.insert(key)
+    def member(self, key):
+        return self.mSet.member(key)
+    def delete(self, key):
+        self.mSet.delete(key)
+    def pop(self):
+        return self.mSet.pop()
+    def first(self):
+        return self.mSet.first()
+    def last(self):
+        return self.mSet.last()
+    def __len__(self):
+        return len(self.mSet)
+    def height(self):
+        return self.mSet.mRoot.mHeight
+
+class BuiltinSet(object):
+    """
+    Adapter for the built-in set.  As it is not ordered, it does not
+    support pop, first and last.
+    """
+    name = 'set'
+    def __init__(self):
+        self.mSet = set()
+    def insert(self, key):
+        self.mSet.add(key)
+    def member(self, key):
+        return key in self.mSet
+    def delete(self, key):
+        self.mSet.discard(key)
+    pop = first = last = None
+    def __len__(self):
+        return len(self.mSet)
+
+class Heap(object):
+    """
+    Adapter for a binary heap.  A heap only supports access to its
+    smallest element, hence member, delete and last are not supported.
+    """
+    name = 'heapq'
+    def __init__(self):
+        self.mHeap = []
+    def insert(self, key):
+        heapq.heappush(self.mHeap, key)
+    def pop(self):
+        return heapq.heappop(self.mHeap)
+    def first(self):
+        return self.mHeap[0]
+    member = delete = last = None
+    def __len__(self):
+        return len(self.mHeap)
+
+class SortedList(object):
+    """
+    Adapter for a sorted list.  Keys are located with a binary search.
+    Insertion, deletion and pop have to move all elements behind the
+    position of the key.
+    """
+    name = 'sorted list'
+    def __init__(self):
+        self.mList = []
+    def insert(self, key):
+        L = self.mList
+        i = bisect.bisect_left(L, key)
+        if i == len(L) or L[i] != key:
+            L.insert(i, key)
+    def member(self, key):
+        L = self.mList
+        i = bisect.bisect_left(L, key)
+        return i < len(L) and L[i] == key
+    def delete(self, key):
+        L = self.mList
+        i = bisect.bisect_left(L, key)
+        if i < len(L) and L[i] == key:
+            del L[i]
+    def pop(self):
+        key = self.mList[0]
+        del self.mList[0]
+        return key
+    def first(self):
+        return self.mList[0]
+    def last(self):
+        return self.mList[-1]
+    def __len__(self):
+        return len(self.mList)
+
+STRUCTURES = [AVLSet, BuiltinSet, Heap, SortedList]
+
+def key_streams(n, rng):
+    """
+    Return a dictionary that maps the name of a key stream to a list of n
+    distinct integers.  The adversarial stream alternates between the
+    smallest and the biggest remaining key, so that an AVL tree has to
+    rotate on both of its flanks and a heap has to sift up every other key
+    all the way to the root.
+    """
+    random_keys = rng.sample(range(10 * n), n)
+    zigzag      = [k for pair in zip(range(n // 2), range(n - 1, n // 2 - 1, -1)) for k in pair]
+    if n % 2:
+        zigzag.append(n // 2)
+    return { 'random':         random_keys,
+             'sorted':         list(range(n)),
+             'reverse-sorted': list(range(n - 1, -1, -1)),
+             'adversarial':    zigzag
+           }
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+def run_structure(Structure, keys, rng, repeat=5):
+    """
+    Run all operations supported by Structure on the list keys and return
+    a dictionary containing the operations per second of every operation,
+    the peak memory per key and, if available, the height of the tree.
+    The operations are timed repeat times on a new structure and the best
+    rate of every operation is kept.  The timings are taken without 
+    tracemalloc, as tracing allocations slows down every allocation.  The
+    memory is measured in a separate run.  As the keys exist before this
+    run, only the memory of the structure itself is counted.
+    """
+    n       = len(keys)
+    lookups = keys[:]
+    rng.shuffle(lookups)
+    result  = {}
+    for _ in range(repeat):
+        for op, rate in _time_operations(Structure, keys, lookups).items():
+            result[op] = max(rate, result.get(op, rate))
+    tracemalloc.start()
+    S = Structure()
+    for k in keys:
+        S.insert(k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['bytes/key'] = peak / n
+    return result
+
+def _time_operations(Structure, keys, lookups):
+    """
+    Time one run of all operations supported by Structure and return a
+    dictionary mapping every operation to its operations per second.
+    """
+    n      = len(keys)
+    result = {}
+    S      = Structure()
+    start   = time.perf_counter()
+    for k in keys:
+        S.insert(k)
+    result['insert'] = _rate(n, time.perf_counter() - start)
+    if hasattr(S, 'height'):
+        result['height'] = S.height()
+    if S.member is not None:
+        start = time.perf_counter()
+        for k in lookups:
+            S.member(k)
+        result['member'] = _rate(n, time.perf_counter() - start)
+    for op in ['first', 'last']:
+        f = getattr(S, op)
+        if f is not None:
+            start = time.perf_counter()
+            for _ in range(n):
+                f()
+            result[op] = _rate(n, time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(n):
+        len(S)
+    result['len'] = _rate(n, time.perf_counter() - start)
+    if S.delete is not None:
+        start = time.perf_counter()
+        for k in lookups[::2]:
+            S.delete(k)
+        result['delete'] = _rate(len(lookups[::2]), time.perf_counter() - start)
+    if S.pop is not None:
+        count = len(S)
+        start = time.perf_counter()
+        while len(S):
+            S.pop()
+        result['pop'] = _rate(count, time.perf_counter() - start)
+    return result
+
+def set_benchmark(sizes, seed, repeat=5):
+    """
+    Run every structure on every key stream for every size in sizes and
+    return a list of records.  Every timing is repeated repeat times.  Every record is a dictionary with the keys
+    'benchmark', 'structure', 'stream', 'n', 'metric' and 'value'.
+    """
+    Records = []
+    for n in sizes:
+        rng = random.Random(seed)
+        for stream, keys in key_streams(n, rng).items():
+            for Structure in STRUCTURES:
+                result = run_structure(Structure, keys, random.Random(seed), repeat)
+                for metric, value in result.items():
+                    Records.append({ 'benchmark': 'operations', 'structure': Structure.name,
+                                     'stream': stream, 'n': n, 'metric': metric, 'value': value })
+    return Records
+
+def snapshot_benchmark(keys, versions, repeat=5):
+    """
+    Compare two ways to keep many versions of a set.  Starting from a set
+    containing keys, every new version is derived from a randomly chosen
+    earlier version by inserting one key, and all versions are kept.  The
+    class Set has to copy the old version before inserting, while the class
+    PersistentSet shares all untouched nodes.  Return a dictionary mapping
+    the names of both methods to a pair (seconds, bytes allocated), where
+    seconds is the best of repeat runs.
+    """
+    new_keys = [-k for k in range(1, versions + 1)]
+    choices  = [random.randrange(i + 1) for i in range(versions)]
+    result   = {}
+    for name, base, derive in [
+            ('copy-then-mutate', Set.from_sorted(sorted(keys)), _copy_then_insert),
+            ('persistent',       PersistentSet.from_sorted(sorted(keys)), PersistentSet.insert)]:
+        seconds = _best_of(repeat, lambda: _derive_versions(base, derive, new_keys, choices))
+        tracemalloc.start()
+        Versions = _derive_versions(base, derive, new_keys, choices)
+        size, _  = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del Versions
+        result[name] = (seconds, size)
+    return result
+
+def _derive_versions(base, derive, new_keys, choices):
+    Versions = [base]
+    for k, i in zip(new_keys, choices):
+        Versions.append(derive(Versions[i], k))
+    return Versions
+
+def _copy_then_insert(S, key):
+    T = S.copy()
+    T.insert(key)
+    return T
+
+def astar(start, goal, Frontier):
+    """
+    Solve the sliding puzzle from start to goal with A* using the Manhattan
+    distance as heuristic.  The frontier is an instance of the class
+    Frontier and holds pairs of the form (f, state).  Return the length of
+    the shortest path and the number of states that have been expanded.
+    """
+    n        = len(goal)
+    Position = { goal[r][c]: (r, c) for r in range(n) for c in range(n) }
+    def h(state):
+        return sum(abs(r - Position[t][0]) + abs(c - Position[t][1])
+                   for r in range(n) for c in range(n) 
+                   for t in (state[r][c],) if t != 0)
+    Distance = { start: 0 }
+    Visited  = set()
+    F        = Frontier()
+    F.insert((h(start), start))
+    while F:
+        _, state = F.pop()
+        if state == goal:
+            return Distance[state], len(Visited)
+        Visited.add(state)
+        g = Distance[state] + 1
+        for ns in _next_states(state):
+            if ns in Visited:
+                continue
+            old = Distance.get(ns)
+            if old is None:
+                F.insert((g + h(ns), ns))
+            elif g < old:
+                hn = h(ns)
+                F.decrease_key((old + hn, ns), (g + hn, ns))
+            else:
+                continue
+            Distance[ns] = g
+
+def _next_states(state):
+    n = len(state)
+    r, c = next((r, c) for r in range(n) for c in range(n) if state[r][c] == 0)
+    for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+        if 0 <= r + dr < n and 0 <= c + dc < n:
+            L = [list(row) for row in state]
+            L[r][c], L[r + dr][c + dc] = L[r + dr][c + dc], 0
+            yield tuple(tuple(row) for row in L)
+
+def frontier_benchmark(repeat=5):
+    """
+    Solve the eight puzzle and the fifteen puzzle from the notebook
+    03-Sliding-Puzzle with A* using both frontiers.  Return a dictionary
+    mapping pairs of the form (puzzle, frontier) to the best of the seconds
+    needed by repeat runs.
+    """
+    Puzzles = {
+        'eight puzzle':   (((8, 0, 6), (5, 4, 7), (2, 3, 1)),
+                           ((0, 1, 2), (3, 4, 5), (6, 7, 8))),
+        'fifteen puzzle': ((( 0,  1,  2,  3), ( 4,  5,  6,  8), (14,  7, 11, 10), ( 9, 15, 12, 13)),
+                           (( 0,  1,  2,  3), ( 4,  5,  6,  7), ( 8,  9, 10, 11), (12, 13, 14, 15)))
+    }
+    result = {}
+    for puzzle, (start, goal) in Puzzles.items():
+        for Frontier in [SetFrontier, HeapFrontier]:
+            result[puzzle, Frontier.__name__] = _best_of(repeat, lambda: astar(start, goal, Frontier))
+    return result
+
+def _best_of(repeat, f):
+    "Call f repeat times and return the smallest number of seconds it has taken."
+    return min(timeit.repeat(f, repeat=repeat, number=1))
+
+def environment():
+    "Return a dictionary describing the machine and the version of the code."
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return { 'python':    platform.python_version(),
+             'machine':   platform.machine(),
+             'platform':  platform.platform(),
+             'commit':    commit,
+             'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+           }
+
+def print_operations(Records):
+    "Print the records of the operations benchmark as a table."
+    columns = OPERATIONS + ['bytes/key', 'height']
+    print(f'{"structure":12s} {"stream":15s} {"n":>8s}' + ''.join(f'{c:>12s}' for c in columns))
+    table = {}
+    for r in Records:
+        if r['benchmark'] == 'operations':
+            table.setdefault((r['structure'], r['stream'], r['n']), {})[r['metric']] = r['value']
+    for (structure, stream, n), row in table.items():
+        cells = []
+        for c in columns:
+            value = row.get(c)
+            cells.append(f'{"-":>12s}' if value is None else f'{value:12,.0f}')
+        print(f'{structure:12s} {stream:15s} {n:8d}' + ''.join(cells))
+
+def compare(Records, baseline, tolerance=0.10):
+    """
+    Compare the metrics in Records with those in baseline and return the
+    list of records that are worse by more than tolerance.  The operations
+    per second are worse if they are smaller, all other metrics are worse
+    if they are bigger.  Every returned record gets the additional entries
+    'baseline' and 'ratio', which is the new value divided by the old one.
+    """
+    def key(r):
+        return r['benchmark'], r['structure'], r['stream'], r['n'], r['metric']
+    Old = { key(r): r['value'] for r in baseline }
+    Regressions = []
+    for r in Records:
+        old = Old.get(key(r))
+        if not old:
+            continue
+        if r['metric'] in OPERATIONS:
+            worse = r['value'] < (1 - tolerance) * old
+        else:
+            worse = r['value'] > (1 + tolerance) * old
+        if worse:
+            Regressions.append(dict(r, baseline=old, ratio=r['value'] / old))
+    return Regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the module Set.')
+    parser.add_argument('--sizes',    type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--seed',     type=int, default=42)
+    parser.add_argument('--versions', type=int, default=200,
+                        help='number of versions for the snapshot benchmark')
+    parser.add_argument('--repeat',   type=int, default=5,
+                        help='number of runs of every timing, the best one is kept')
+    parser.add_argument('--json',     help='write the results to this file')
+    parser.add_argument('--compare',  help='compare with the results stored in this file')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='relative slowdown that is reported as a regression')
+    args = parser.parse_args()
+    random.seed(args.seed)
+    Records = set_benchmark(args.sizes, args.seed, args.repeat)
+    print_operations(Records)
+    n    = max(args.sizes) // 10
+    keys = random.Random(args.seed).sample(range(10 * n), n)
+    print(f'\n{args.versions} versions of a set with {n} keys:')
+    for name, (seconds, size) in snapshot_benchmark(keys, args.versions, args.repeat).items():
+        print(f'{name:16s}: {seconds:8.3f} sec, {size / 2**20:8.1f} MiB')
+        Records.append({ 'benchmark': 'snapshots', 'structure': name, 'stream': 'random',
+                         'n': n, 'metric': 'seconds', 'value': seconds })
+        Records.append({ 'benchmark': 'snapshots', 'structure': name, 'stream': 'random',
+                         'n': n, 'metric': 'bytes', 'value': size })
+    print('\nA* search:')
+    for (puzzle, name), seconds in frontier_benchmark(args.repeat).items():
+        print(f'{puzzle:14s} {name:12s}: {seconds:8.3f} sec')
+        Records.append({ 'benchmark': 'frontier', 'structure': name, 'stream': puzzle,
+                         'n': None, 'metric': 'seconds', 'value': seconds })
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({ 'environment': environment(), 'records': Records }, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['records']
+        Regressions = compare(Records, baseline, args.tolerance)
+        print(f'\n{len(Regressions)} regressions compared with {args.compare}')
+        for r in Regressions:
+            unit = 'ops/sec' if r['metric'] in OPERATIONS else r['metric']
+            print(f'{r["structure"]:12s} {r["stream"]:15s} {str(r["n"]):>8s} {r["metric"]:9s}: '
+                  f'{r["value"]:14,.3f} {unit}, was {r["baseline"]:14,.3f} ({r["ratio"]:.0%})')
+        if Regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()